@@ -1,24 +1,56 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from datetime import datetime, date
-from typing import Optional
-from trip_agents import TripAgents
-from trip_tasks import TripTasks
-from crewai import Agent, LLM, Crew
-import os
-from functools import lru_cache
-from dotenv import load_dotenv
+from typing import Optional, List
+from trip_agents import get_trip_agents
+from trip_planner import TripPlanner
+from trip_jobs import JobManager, RateLimiter, Rejected, SUCCESS, ERROR
+from trip_events import format_sse
+from trip_cache import fresh_run, trip_fingerprint, trip_result_cache
+from trip_metrics import metrics
+from trip_trace import TraceRecorder, recording
+from trip_budget import BudgetExceeded, TokenBudget, metered
+from tools.llm import llm_calls_in_flight
+from settings import get_settings
+from contextlib import asynccontextmanager
+import asyncio
 import uvicorn
 
-# Load environment variables from .env file
-load_dotenv()
+# Collect stage, tool, HTTP and LLM timings for /metrics
+metrics.install()
+
+# Bounded worker pool that runs crews off the event loop, with a bounded admission queue
+job_manager = JobManager(
+    max_workers=get_settings().TRIP_WORKERS,
+    retention_seconds=get_settings().JOB_RETENTION_SECONDS,
+    # A negative depth leaves the queue unbounded
+    max_queue=get_settings().TRIP_QUEUE_DEPTH if get_settings().TRIP_QUEUE_DEPTH >= 0 else None
+)
+metrics.gauge("trip_jobs_running", "Planner slots running (a batch takes one per parallel trip)", lambda: job_manager.stats()["running"])
+metrics.gauge("trip_jobs_queued", "Planner slots waiting for a worker", lambda: job_manager.stats()["queued"])
+metrics.gauge("llm_calls_in_flight", "LLM calls holding an LLM_CONCURRENCY slot", llm_calls_in_flight)
+
+# Optional per-client limit on planning requests
+rate_limiter = RateLimiter(
+    get_settings().CLIENT_RATE_LIMIT,
+    burst=get_settings().CLIENT_RATE_BURST or None
+) if get_settings().CLIENT_RATE_LIMIT > 0 else None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the shared LLM client and tools once, before the first request
+    get_trip_agents()
+    yield
+    job_manager.shutdown()
 
 # Initialize FastAPI app with metadata
 app = FastAPI(
     title="TravAgent",
     description="AI-powered travel planning API using CrewAI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Enable CORS for all origins (for development/demo purposes)
@@ -58,24 +90,74 @@ class TripRequest(BaseModel):
         description="Your interests and trip details"
     )
 
+# Request model for revising an earlier plan; omitted fields keep their previous value
+class TripRevisionRequest(BaseModel):
+    origin: Optional[str] = Field(None, example="Pune, India", description="New current location")
+    destination: Optional[str] = Field(None, description="New destination city and country")
+    start_date: Optional[date] = Field(None, example="2025-06-11", description="New start date of the trip")
+    end_date: Optional[date] = Field(None, example="2025-06-16", description="New end date of the trip")
+    interests: Optional[str] = Field(None, description="New interests and trip details")
+
+# Estimated LLM usage of a planning run and the state of its token budget
+class TripUsage(BaseModel):
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    llm_calls: int
+    cost_usd: float
+    budget_status: str
+    partial: bool
+    soft_budget_tokens: Optional[int] = None
+    hard_budget_tokens: Optional[int] = None
+    refused_llm_calls: int = 0
+    skipped_scrapes: int = 0
+    trimmed_pages: int = 0
+
 # Response model for trip planning
 class TripResponse(BaseModel):
     status: str
     message: str
     itinerary: Optional[str] = None
     error: Optional[str] = None
+    # HTTP status code of the error, when planning failed with one
+    error_status: Optional[int] = None
+    usage: Optional[TripUsage] = None
+    # Chrome trace-event timeline of the run, when requested with ?trace=true
+    trace: Optional[dict] = None
+
+# Request model for planning several trips together
+class BatchTripRequest(BaseModel):
+    requests: List[TripRequest] = Field(
+        ...,
+        description="Trips to plan; trips to the same destination in the same month share research"
+    )
+
+# Per-trip result of a batch
+class BatchItemResponse(BaseModel):
+    index: int
+    status: str
+    itinerary: Optional[str] = None
+    error: Optional[str] = None
+    group: Optional[str] = None
+    shared_gather: bool = False
+    cached: bool = False
+    usage: Optional[TripUsage] = None
 
-# Settings class to load API keys from environment
-class Settings:
-    def __init__(self):
-        self.GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-        self.SERPER_API_KEY = os.getenv("SERPER_API_KEY")
-        self.BROWSERLESS_API_KEY = os.getenv("BROWSERLESS_API_KEY")
+# Response model for batch planning
+class BatchTripResponse(BaseModel):
+    status: str
+    message: str
+    results: List[BatchItemResponse]
 
-# Cached settings loader
-@lru_cache()
-def get_settings():
-    return Settings()
+# Response model for asynchronous planning jobs
+class JobResponse(BaseModel):
+    job_id: str
+    status: str
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    reused_stages: List[str] = []
+    result: Optional[TripResponse] = None
 
 # Main class to orchestrate trip planning using CrewAI
 class TripCrew():
@@ -87,58 +169,19 @@ class TripCrew():
         self.cities = cities
         self.date_range = date_range
         self.interests = interests
-        # Initialize LLM (Language Model) for CrewAI
-        self.llm = LLM(model="gemini/gemini-2.0-flash")
 
     def run(self):
         """
-        Runs the trip planning process by initializing agents, tasks, and Crew.
-        Returns the generated trip plan or None if an error occurs.
+        Runs the identify -> gather -> plan pipeline for this request.
+        Returns the generated itinerary; raises HTTPException if planning fails.
         """
         try:
-            # Initialize agent and task classes
-            agents = TripAgents()
-            tasks = TripTasks()
-
-            # Create agents for different roles
-            city_selector_agent = agents.city_selection_agent()
-            local_expert_agent = agents.local_expert()
-            travel_concierge_agent = agents.travel_concierge()
-
-            # Define tasks for each agent
-            identify_task = tasks.identity_task(
-                city_selector_agent,
-                self.origin,
-                self.cities,
-                self.interests,
-                self.date_range
-            )
-            gather_task = tasks.gather_task(
-                local_expert_agent,
-                self.origin,
-                self.cities,
-                self.interests,
-                self.date_range
-            )
-            plan_task = tasks.plan_task(
-                travel_concierge_agent,
-                self.origin,
-                self.cities,
-                self.interests,
-                self.date_range
-            )
-
-            # Create Crew with agents and tasks
-            crew = Crew(
-                agents=[city_selector_agent, local_expert_agent, travel_concierge_agent],
-                tasks=[identify_task, gather_task, plan_task],
-                verbose=True
-            )
-
-            # Run the Crew to generate the itinerary
-            result = crew.kickoff()
-            return result.raw
+            # Agents come from the process-wide factory; each stage runs as its own crew
+            return TripPlanner().run(self.origin, self.cities, self.interests, self.date_range)
 
+        except BudgetExceeded:
+            # Left for the itinerary cache, so callers joined to this run plan on their own budget
+            raise
         except Exception as e:
             # Raise HTTPException for FastAPI error handling
             raise HTTPException(
@@ -155,44 +198,303 @@ async def root():
         "redoc_url":"/redoc"
     }
 
-# Main endpoint to plan a trip
-@app.post("/api/v1/plan-trip",response_model=TripResponse)
-async def plan_trip(trip_request: TripRequest):
-    # Validate date range
+# Prometheus-style metrics
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+def format_date_range(trip_request: TripRequest):
+    """
+    Validates the requested dates and returns the date range string used by the tasks.
+    """
     if trip_request.end_date <= trip_request.start_date:
         raise HTTPException(
             status_code=400,
             detail="End date must be after start date"
         )
-    
-    # Format date range string
-    date_range = f"{trip_request.start_date} to {trip_request.end_date}"
+    return f"{trip_request.start_date} to {trip_request.end_date}"
 
+def run_trip(trip_request: TripRequest, date_range: str, trace: Optional[TraceRecorder] = None,
+             budget: Optional[TokenBudget] = None):
+    """
+    Runs a full crew for the request. Executed on the job worker pool.
+    Identical requests are served from the itinerary cache or joined to the
+    crew already planning them. A traced run bypasses the itinerary cache,
+    stage checkpoints and destination knowledge, and records its timeline
+    into `trace`. LLM calls are charged to `budget`.
+
+    Raises:
+        HTTPException: If planning fails, including when the budget runs out before any stage finished.
+    """
+    trip_crew = TripCrew(
+        trip_request.origin,
+        trip_request.destination,
+        date_range,
+        trip_request.interests
+    )
     try:
-        # Initialize trip crew and generate itinerary
-        trip_crew = TripCrew(
-            trip_request.origin,
-            trip_request.destination,
-            date_range,
-            trip_request.interests
+        with metered(budget):
+            if trace is not None:
+                with recording(trace), fresh_run():
+                    return trip_crew.run()
+            fingerprint = trip_fingerprint(
+                trip_request.origin,
+                trip_request.destination,
+                date_range,
+                trip_request.interests
+            )
+            return trip_result_cache.get_or_run(fingerprint, trip_crew.run)
+    except BudgetExceeded as e:
+        raise HTTPException(
+            status_code=500,
+            detail=str(e)
         )
-        itinerary = trip_crew.run()
 
-        # Return successful response
-        return TripResponse(
+def too_many_requests(rejected: Rejected):
+    """
+    Converts an admission rejection into a 429 response with Retry-After.
+    """
+    return HTTPException(
+        status_code=429,
+        detail=str(rejected),
+        headers={"Retry-After": str(rejected.retry_after)}
+    )
+
+def admit_client(request: Request):
+    """
+    Applies the per-client rate limit to a planning request. Clients are
+    identified by their X-Client-Id header, or else their address.
+    """
+    if rate_limiter is None:
+        return
+    client = request.headers.get("X-Client-Id") or (request.client.host if request.client else "unknown")
+    try:
+        rate_limiter.acquire(client)
+    except Rejected as e:
+        raise too_many_requests(e)
+
+def submit_job(fn, *args, **kwargs):
+    """
+    Queues a job on the worker pool, answering 429 when the queue is full.
+    """
+    try:
+        return job_manager.submit(fn, *args, **kwargs)
+    except Rejected as e:
+        raise too_many_requests(e)
+
+def submit_trip(trip_request: TripRequest, date_range: str, trace: bool = False):
+    """
+    Queues a planning job for the request, recording its timeline if `trace` is set.
+    """
+    recorder = TraceRecorder() if trace else None
+    budget = TokenBudget()
+    job = submit_job(run_trip, trip_request, date_range, trace=recorder, budget=budget, payload=trip_request)
+    job.trace = recorder
+    job.budget = budget
+    return job
+
+def job_to_response(job):
+    """
+    Converts a TripJob into the API response model.
+    """
+    result = None
+    usage = job.budget.usage() if job.budget is not None else None
+    if job.status == SUCCESS and usage and usage["partial"]:
+        result = TripResponse(
+            status="PARTIAL",
+            message="Token budget exhausted; returning the partial plan",
+            itinerary=job.result,
+            usage=usage
+        )
+    elif job.status == SUCCESS:
+        result = TripResponse(
             status="SUCCESS",
             message="Trip plan generated successfully",
-            itinerary = itinerary
+            itinerary=job.result,
+            usage=usage
         )
-    
-    except Exception as e:
-        # Return error response
-        return TripResponse(
+    elif job.status == ERROR:
+        result = TripResponse(
             status="error",
-            message = "Failed to generate trip plan",
-            error = str(e)
+            message="Failed to generate trip plan",
+            error=job.error,
+            error_status=job.error_status,
+            usage=usage
+        )
+    events, _ = job.events.read(0)
+    return JobResponse(
+        job_id=job.id,
+        status=job.status,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        reused_stages=[event["stage"] for event in events if event["type"] == "stage_resumed"],
+        result=result
+    )
+
+# Submit a planning job and return immediately with its id
+@app.post("/api/v1/plan-trip/jobs", response_model=JobResponse, status_code=202, dependencies=[Depends(admit_client)])
+async def create_plan_trip_job(
+    trip_request: TripRequest,
+    trace: bool = Query(False, description="Record a Chrome trace-event timeline, served at /jobs/{job_id}/trace")
+):
+    date_range = format_date_range(trip_request)
+    job = submit_trip(trip_request, date_range, trace=trace)
+    return job_to_response(job)
+
+# Poll a planning job for its status or result
+@app.get("/api/v1/plan-trip/jobs/{job_id}", response_model=JobResponse)
+async def get_plan_trip_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Job not found"
+        )
+    return job_to_response(job)
+
+# Re-plan an earlier trip with some inputs changed, reusing the stages the change does not affect
+@app.post("/api/v1/plan-trip/jobs/{job_id}/revise", response_model=JobResponse, status_code=202, dependencies=[Depends(admit_client)])
+async def revise_plan_trip_job(
+    job_id: str,
+    revision: TripRevisionRequest,
+    trace: bool = Query(False, description="Record a Chrome trace-event timeline, served at /jobs/{job_id}/trace")
+):
+    previous = job_manager.get(job_id)
+    if previous is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Job not found"
+        )
+    if not isinstance(previous.payload, TripRequest):
+        raise HTTPException(
+            status_code=400,
+            detail="Only single-trip jobs can be revised"
+        )
+    trip_request = previous.payload.model_copy(update=revision.model_dump(exclude_none=True))
+    date_range = format_date_range(trip_request)
+    job = submit_trip(trip_request, date_range, trace=trace)
+    return job_to_response(job)
+
+# Timeline of a traced job in Chrome trace-event format (chrome://tracing, ui.perfetto.dev)
+@app.get("/api/v1/plan-trip/jobs/{job_id}/trace")
+async def get_plan_trip_job_trace(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None or job.trace is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Job not found or not traced (submit it with ?trace=true)"
         )
+    return job.trace.to_chrome()
+
+async def stream_job_events(job):
+    """
+    Yields the job's progress events as server-sent events until the job finishes.
+    """
+    index = 0
+    while True:
+        events, closed = job.events.read(index)
+        for event in events:
+            yield format_sse(event)
+        index += len(events)
+        if closed:
+            break
+        await asyncio.sleep(0.25)
+
+# Stream progress events of an existing planning job
+@app.get("/api/v1/plan-trip/jobs/{job_id}/events")
+async def get_plan_trip_job_events(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Job not found"
+        )
+    return StreamingResponse(stream_job_events(job), media_type="text/event-stream")
+
+# Plan a trip and stream task, tool and result events as they happen
+@app.post("/api/v1/plan-trip/stream", dependencies=[Depends(admit_client)])
+async def plan_trip_stream(trip_request: TripRequest):
+    date_range = format_date_range(trip_request)
+    job = submit_trip(trip_request, date_range)
+    return StreamingResponse(
+        stream_job_events(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Job-Id": job.id}
+    )
+
+def run_trip_batch(trips, workers):
+    """
+    Plans a batch of validated trips with `workers` trips in parallel. Executed on the job worker pool.
+    """
+    return TripPlanner().plan_batch(trips, workers=workers)
+
+# Plan several trips at once, sharing destination research between similar trips
+@app.post("/api/v1/plan-trips", response_model=BatchTripResponse, dependencies=[Depends(admit_client)])
+async def plan_trips(batch_request: BatchTripRequest):
+    max_items = get_settings().BATCH_MAX_ITEMS
+    if not batch_request.requests or len(batch_request.requests) > max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch must contain between 1 and {max_items} requests"
+        )
+
+    # Validate each item on its own so one bad request does not fail the batch
+    results = [None] * len(batch_request.requests)
+    trips, positions = [], []
+    for index, trip_request in enumerate(batch_request.requests):
+        try:
+            date_range = format_date_range(trip_request)
+        except HTTPException as e:
+            results[index] = BatchItemResponse(index=index, status="error", error=e.detail)
+            continue
+        trips.append({
+            "origin": trip_request.origin,
+            "cities": trip_request.destination,
+            "interests": trip_request.interests,
+            "date_range": date_range
+        })
+        positions.append(index)
+
+    if trips:
+        # The batch takes one job slot per trip it plans in parallel
+        workers = min(get_settings().TRIP_WORKERS, len(trips))
+        job = submit_job(run_trip_batch, trips, workers, payload=batch_request, slots=workers)
+        await asyncio.wrap_future(job.future)
+        if job.status == ERROR:
+            for index in positions:
+                results[index] = BatchItemResponse(index=index, status="error", error=job.error)
+        else:
+            for index, item in zip(positions, job.result):
+                results[index] = BatchItemResponse(index=index, **item)
+
+    succeeded = sum(1 for item in results if item.status == "SUCCESS")
+    planned = sum(1 for item in results if item.status in ("SUCCESS", "PARTIAL"))
+    if succeeded == len(results):
+        status, message = "SUCCESS", "All trip plans generated successfully"
+    elif planned:
+        status, message = "PARTIAL", f"{succeeded} of {len(results)} trip plans generated, {planned - succeeded} partial"
+    else:
+        status, message = "error", "Failed to generate trip plans"
+    return BatchTripResponse(status=status, message=message, results=results)
+
+# Main endpoint to plan a trip
+@app.post("/api/v1/plan-trip",response_model=TripResponse, dependencies=[Depends(admit_client)])
+async def plan_trip(
+    trip_request: TripRequest,
+    trace: bool = Query(False, description="Include a Chrome trace-event timeline of the run in the response")
+):
+    # Validate and format date range
+    date_range = format_date_range(trip_request)
+
+    # Run the crew on the worker pool and wait without blocking the event loop
+    job = submit_trip(trip_request, date_range, trace=trace)
+    await asyncio.wrap_future(job.future)
+    result = job_to_response(job).result
+    if job.trace is not None:
+        result.trace = job.trace.to_chrome()
+    return result
     
 # Run the app with Uvicorn if executed as main script
 if __name__ == "__main__":
-    uvicorn.run(app,host="0.0.0.0",port=8080)
+    uvicorn.run(app,host="0.0.0.0",port=8080)
\ No newline at end of file
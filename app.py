@@ -1,10 +1,9 @@
-from crewai import Crew, LLM
-from trip_agents import TripAgents
+from crewai import Crew
+from trip_agents import get_trip_agents
 from trip_tasks import TripTasks
 import streamlit as st
 import datetime
 import sys
-from langchain_openai import OpenAI
 
 
 # Page configuration with custom styling
@@ -193,6 +192,12 @@ def create_feature_card(icon, title, description):
     """
 
 
+@st.cache_resource
+def load_trip_agents():
+    """Build the LLM client and tools once per Streamlit server process"""
+    return get_trip_agents()
+
+
 class TripCrew:
     def __init__(self, origin, cities, date_range, interests):
         self.cities = cities
@@ -201,15 +206,10 @@ class TripCrew:
         # Convert date_range to string format for better handling
         self.date_range = f"{date_range[0].strftime('%Y-%m-%d')} to {date_range[1].strftime('%Y-%m-%d')}"
         self.output_placeholder = st.empty()
-        self.llm = LLM(model="gemini/gemini-2.0-flash")
-        # self.llm = OpenAI(
-        #     temperature=0.7,
-        #     model_name="gpt-4",
-        # )
 
     def run(self):
         try:
-            agents = TripAgents()
+            agents = load_trip_agents()
             tasks = TripTasks()
 
             city_selector_agent = agents.city_selection_agent()
@@ -0,0 +1,257 @@
+"""
+End-to-end benchmark of a full planning run against local stub services.
+
+Starts stand-ins for Serper, browserless.io and an OpenAI-compatible LLM
+(see benchmarks/stubs.py), points the app at them, and plans trips through
+`cli_app.TripCrew.run` or the `api_app` HTTP endpoint at fixed concurrency
+levels. For each level it reports p50/p95/p99 latency, throughput, peak
+RSS, and LLM/search/scrape calls per trip. Results are written as JSON
+tagged with the git commit, so runs on different commits can be compared
+with --compare.
+
+Every trip goes to a distinct destination, so the itinerary, destination
+and search caches do not hide the work being measured.
+
+Usage:
+    python -m benchmarks.e2e --concurrency 1 4 8 --trips 8 --out e2e.json
+    python -m benchmarks.e2e --target api --llm-latency 1.5:0.5 --compare e2e.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stubs import BrowserlessStub, LLMStub, SerperStub
+
+
+def percentile(values, pct):
+    """
+    Linear-interpolated percentile of `values` (pct in 0-100).
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def git_commit():
+    def git(*args):
+        return subprocess.run(["git", *args], capture_output=True, text=True).stdout.strip()
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def configure_environment(serper, browserless, llm):
+    """
+    Points the app at the stubs. Must run before the app modules are imported,
+    since they read their configuration at import time.
+    """
+    os.environ.update({
+        "SERPER_URL": f"{serper.url}/search",
+        "SERPER_API_KEY": "stub",
+        "BROWSERLESS_URL": f"{browserless.url}/content",
+        "BROWSERLESS_API_KEY": "stub",
+        "LLM_MODEL": "openai/gpt-4o-mini",
+        "LLM_BASE_URL": f"{llm.url}/v1",
+        "LLM_API_KEY": "stub",
+        # Measure the pipeline, not whatever an earlier run left on disk
+        "CHECKPOINT_CACHE_PATH": ""
+    })
+    for name in ("CASSETTE_PATH", "SEARCH_CACHE_PATH", "TRIP_CACHE_PATH", "DESTINATION_CACHE_PATH",
+                 "BROWSER_PAGE_CACHE_PATH", "BROWSER_SUMMARY_CACHE_PATH"):
+        os.environ.pop(name, None)
+
+
+def make_trips(level, count):
+    return [
+        {
+            "origin": "Bangalore, India",
+            "destination": f"Stub City {level}-{i}",
+            "start_date": "2025-05-01",
+            "end_date": "2025-05-07",
+            "interests": "2 adults who love food, beaches and hiking"
+        }
+        for i in range(count)
+    ]
+
+
+class CliTarget():
+    """
+    Plans trips in-process through cli_app.TripCrew.run.
+    """
+    name = "cli"
+
+    def __init__(self):
+        import cli_app
+        self.cli_app = cli_app
+
+    def plan(self, trip):
+        crew = self.cli_app.TripCrew(
+            trip["origin"], trip["destination"], f"{trip['start_date']} to {trip['end_date']}", trip["interests"]
+        )
+        if not crew.run():
+            raise RuntimeError("no itinerary")
+
+    def close(self):
+        pass
+
+
+class ApiTarget():
+    """
+    Plans trips over HTTP against api_app served by uvicorn in this process.
+    """
+    name = "api"
+
+    def __init__(self):
+        import requests
+        import uvicorn
+        import api_app
+        self.http = requests.Session()
+        self.server = uvicorn.Server(uvicorn.Config(api_app.app, host="127.0.0.1", port=0, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.05)
+        port = self.server.servers[0].sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/api/v1/plan-trip"
+
+    def plan(self, trip):
+        response = self.http.post(self.url, json=trip, timeout=3600)
+        if response.status_code != 200 or response.json().get("status") != "SUCCESS":
+            raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+
+    def close(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+def run_level(target, stubs, level, trips):
+    """
+    Plans `trips` with `level` trips in flight at a time and aggregates the results.
+    """
+    before = {name: stub.snapshot() for name, stub in stubs.items()}
+    latencies, errors = [], []
+
+    def timed(trip):
+        start = time.perf_counter()
+        try:
+            target.plan(trip)
+            latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            errors.append(str(e))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=level) as executor:
+        list(executor.map(timed, trips))
+    wall = time.perf_counter() - start
+
+    after = {name: stub.snapshot() for name, stub in stubs.items()}
+    delta = {name: {key: after[name].get(key, 0) - before[name].get(key, 0) for key in after[name]} for name in stubs}
+    per_trip = lambda value: round(value / len(trips), 2)
+    return {
+        "concurrency": level,
+        "trips": len(trips),
+        "errors": len(errors),
+        "error_samples": errors[:3],
+        "p50_seconds": round(percentile(latencies, 50), 3) if latencies else None,
+        "p95_seconds": round(percentile(latencies, 95), 3) if latencies else None,
+        "p99_seconds": round(percentile(latencies, 99), 3) if latencies else None,
+        "throughput_trips_per_minute": round(len(latencies) / wall * 60, 2),
+        "wall_seconds": round(wall, 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "per_trip": {
+            "llm_calls": per_trip(delta["llm"]["requests"]),
+            "llm_prompt_tokens": per_trip(delta["llm"].get("prompt_tokens", 0)),
+            "llm_completion_tokens": per_trip(delta["llm"].get("completion_tokens", 0)),
+            "search_calls": per_trip(delta["serper"]["requests"]),
+            "scrape_calls": per_trip(delta["browserless"]["requests"])
+        }
+    }
+
+
+def print_report(report, previous=None):
+    previous_levels = {row["concurrency"]: row for row in (previous or {}).get("levels", [])}
+    print(f"{report['target']} @ {report['commit'][:10]}{' (dirty)' if report['dirty'] else ''}")
+    print(f"{'conc':>5}{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}{'trips/min':>11}{'RSS MB':>9}{'llm/trip':>10}{'search':>8}{'scrape':>8}{'errors':>8}")
+    for row in report["levels"]:
+        per_trip = row["per_trip"]
+        print(f"{row['concurrency']:>5}{row['p50_seconds'] or 0:>9.2f}{row['p95_seconds'] or 0:>9.2f}{row['p99_seconds'] or 0:>9.2f}"
+              f"{row['throughput_trips_per_minute']:>11.2f}{row['peak_rss_mb']:>9.1f}{per_trip['llm_calls']:>10.1f}"
+              f"{per_trip['search_calls']:>8.1f}{per_trip['scrape_calls']:>8.1f}{row['errors']:>8}")
+        base = previous_levels.get(row["concurrency"])
+        if base and base.get("p50_seconds") and row["p50_seconds"]:
+            print(f"{'':>5}{row['p50_seconds'] / base['p50_seconds'] - 1:>+9.0%}"
+                  f"{(row['p95_seconds'] or 0) / (base['p95_seconds'] or 1) - 1:>+9.0%}"
+                  f"{(row['p99_seconds'] or 0) / (base['p99_seconds'] or 1) - 1:>+9.0%}"
+                  f"{row['throughput_trips_per_minute'] / (base['throughput_trips_per_minute'] or 1) - 1:>+11.0%}"
+                  f"   vs {previous['commit'][:10]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end TravAgent benchmark against local stub services")
+    parser.add_argument("--target", choices=["cli", "api"], default="cli", help="Drive cli_app.TripCrew.run or the api_app endpoint")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4], help="Trips in flight at a time, one run per level")
+    parser.add_argument("--trips", type=int, default=8, help="Trips planned per concurrency level")
+    parser.add_argument("--llm-latency", default="0.5:0.2", help="LLM latency, 'mean' or 'mean:stddev' seconds")
+    parser.add_argument("--llm-tokens", type=int, default=400, help="Tokens per final LLM answer")
+    parser.add_argument("--llm-tool-calls", type=int, default=2, help="Tool calls per agent conversation")
+    parser.add_argument("--search-latency", default="0.3:0.1", help="Serper latency spec")
+    parser.add_argument("--search-results", type=int, default=10, help="Organic results per search")
+    parser.add_argument("--scrape-latency", default="1.0:0.4", help="browserless latency spec")
+    parser.add_argument("--page-kb", type=int, default=50, help="Size of scraped pages in KB")
+    parser.add_argument("--out", help="Write the report as JSON to this file")
+    parser.add_argument("--compare", help="Earlier JSON report to compare against")
+    parser.add_argument("--verbose", action="store_true", help="Keep the crews' console output")
+    args = parser.parse_args()
+
+    stubs = {
+        "serper": SerperStub(args.search_latency, results=args.search_results).start(),
+        "browserless": BrowserlessStub(args.scrape_latency, page_kb=args.page_kb).start(),
+        "llm": LLMStub(args.llm_latency, tokens=args.llm_tokens, tool_calls=args.llm_tool_calls).start()
+    }
+    configure_environment(stubs["serper"], stubs["browserless"], stubs["llm"])
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    output = None if args.verbose else io.StringIO()
+    levels = []
+    with contextlib.redirect_stdout(output) if output else contextlib.nullcontext():
+        target = ApiTarget() if args.target == "api" else CliTarget()
+        try:
+            # Warm-up: builds the agent factory and tools outside the measurements
+            run_level(target, stubs, 1, make_trips("warmup", 1))
+            for level in args.concurrency:
+                levels.append(run_level(target, stubs, level, make_trips(level, args.trips)))
+        finally:
+            target.close()
+            for stub in stubs.values():
+                stub.stop()
+
+    report = {
+        **git_commit(),
+        "target": args.target,
+        "timestamp": time.time(),
+        "python": sys.version.split()[0],
+        "config": {key: value for key, value in vars(args).items() if key not in ("out", "compare", "verbose")},
+        "levels": levels
+    }
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_report(report, previous)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
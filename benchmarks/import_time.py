@@ -0,0 +1,128 @@
+"""
+Import-time benchmark for the TravAgent entry points.
+
+Measures, in fresh interpreters, how long importing each entry point takes,
+the peak RSS afterwards, how many modules were loaded, and whether the
+Streamlit stack was pulled in. Pass --baseline <git ref> to run the same
+measurements against another commit (checked out in a temporary worktree)
+and print both side by side.
+
+Usage:
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --runs 7 --baseline HEAD~1 --out import_time.json
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Entry points that should start without Streamlit
+DEFAULT_MODULES = ["api_app", "cli_app", "trip_agents", "trip_tasks", "tools.search_tools", "tools.browser_tools"]
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+error = None
+try:
+    import {module}
+except Exception as e:
+    error = f"{{type(e).__name__}}: {{e}}"
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": elapsed,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "modules_loaded": len(sys.modules),
+    "streamlit_loaded": "streamlit" in sys.modules,
+    "error": error
+}}))
+"""
+
+
+def measure(module, cwd, runs):
+    """
+    Imports `module` in `runs` fresh interpreters rooted at `cwd` and aggregates the samples.
+    """
+    samples = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module)],
+            cwd=cwd,
+            capture_output=True,
+            text=True,
+            env={**os.environ, "PYTHONPATH": cwd}
+        )
+        lines = completed.stdout.strip().splitlines()
+        if completed.returncode != 0 or not lines:
+            return {"module": module, "error": completed.stderr.strip().splitlines()[-1:] or "probe failed"}
+        samples.append(json.loads(lines[-1]))
+
+    return {
+        "module": module,
+        "median_seconds": round(statistics.median(s["seconds"] for s in samples), 4),
+        "min_seconds": round(min(s["seconds"] for s in samples), 4),
+        "max_rss_mb": round(max(s["max_rss_mb"] for s in samples), 1),
+        "modules_loaded": samples[-1]["modules_loaded"],
+        "streamlit_loaded": samples[-1]["streamlit_loaded"],
+        "error": samples[-1]["error"]
+    }
+
+
+def measure_tree(cwd, modules, runs):
+    return [measure(module, cwd, runs) for module in modules]
+
+
+def measure_ref(ref, modules, runs):
+    """
+    Measures the given git ref in a temporary worktree.
+    """
+    repo = subprocess.run(["git", "rev-parse", "--show-toplevel"], capture_output=True, text=True, check=True).stdout.strip()
+    workdir = tempfile.mkdtemp(prefix="travagent-baseline-")
+    subprocess.run(["git", "worktree", "add", "--detach", workdir, ref], cwd=repo, capture_output=True, check=True)
+    try:
+        return measure_tree(workdir, modules, runs)
+    finally:
+        subprocess.run(["git", "worktree", "remove", "--force", workdir], cwd=repo, capture_output=True)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def print_table(current, baseline=None):
+    header = f"{'module':<22}{'median s':>10}{'RSS MB':>9}{'modules':>9}{'streamlit':>11}"
+    if baseline:
+        header += f"{'base s':>9}{'base RSS':>10}{'base st':>9}"
+    print(header)
+    base_by_module = {row["module"]: row for row in baseline or []}
+    for row in current:
+        if "median_seconds" not in row:
+            print(f"{row['module']:<22}  error: {row['error']}")
+            continue
+        line = f"{row['module']:<22}{row['median_seconds']:>10.3f}{row['max_rss_mb']:>9.1f}{row['modules_loaded']:>9}{str(row['streamlit_loaded']):>11}"
+        base = base_by_module.get(row["module"])
+        if base and "median_seconds" in base:
+            line += f"{base['median_seconds']:>9.3f}{base['max_rss_mb']:>10.1f}{str(base['streamlit_loaded']):>9}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time of TravAgent entry points")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per module")
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES, help="Modules to import")
+    parser.add_argument("--baseline", help="Git ref to compare against (e.g. HEAD~1)")
+    parser.add_argument("--out", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    current = measure_tree(root, args.modules, args.runs)
+    baseline = measure_ref(args.baseline, args.modules, args.runs) if args.baseline else None
+
+    print_table(current, baseline)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"current": current, "baseline": baseline}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Local stand-ins for the services a planning run calls: Serper search,
+browserless.io page content and an OpenAI-compatible chat completion
+endpoint. Each stub answers with synthetic payloads of configurable size
+after a configurable latency, and counts the requests it served.
+"""
+import json
+import random
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "hotel beach market temple street food museum ferry island sunset trek "
+    "festival night budget local family cafe river old town viewpoint harbor"
+).split()
+
+
+def parse_latency(spec):
+    """
+    Parses a latency spec "mean" or "mean:stddev" (seconds) into a sampler.
+
+    The sampler draws from a normal distribution clipped at zero, so
+    "0.8:0.3" gives mostly 0.5-1.1 s with an occasional slow outlier.
+    """
+    mean, _, stddev = str(spec).partition(":")
+    mean, stddev = float(mean), float(stddev or 0)
+    return lambda: max(0.0, random.gauss(mean, stddev)) if stddev else mean
+
+
+def filler(words, seed):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+class StubServer():
+    """
+    Threaded HTTP server answering POST requests with `respond(path, body)`.
+    """
+    name = "stub"
+
+    def __init__(self, latency="0"):
+        self.sample_latency = parse_latency(latency)
+        self.counters = {"requests": 0}
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                time.sleep(stub.sample_latency())
+                status, content_type, payload = stub.respond(self.path, body)
+                data = payload.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name=f"{self.name}-stub", daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def count(self, **increments):
+        with self._lock:
+            self.counters["requests"] += 1
+            for name, value in increments.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def respond(self, path, body):
+        raise NotImplementedError
+
+
+class SerperStub(StubServer):
+    """
+    Answers like google.serper.dev/search with `results` organic results.
+    """
+    name = "serper"
+
+    def __init__(self, latency="0", results=10):
+        super().__init__(latency)
+        self.results = results
+
+    def respond(self, path, body):
+        self.count()
+        query = json.loads(body or b"{}").get("q", "")
+        organic = [
+            {
+                "title": f"{query} guide {i}",
+                "link": f"https://example.com/{zlib.crc32(query.encode()) % 1000}/{i}",
+                "snippet": filler(30, f"{query}-{i}")
+            }
+            for i in range(self.results)
+        ]
+        return 200, "application/json", json.dumps({"organic": organic})
+
+
+class BrowserlessStub(StubServer):
+    """
+    Answers like browserless.io /content with an HTML page of about `page_kb` KB,
+    including the header/footer/cookie chrome a real page has.
+    """
+    name = "browserless"
+
+    def __init__(self, latency="0", page_kb=50):
+        super().__init__(latency)
+        self.page_kb = page_kb
+
+    def respond(self, path, body):
+        self.count()
+        url = json.loads(body or b"{}").get("url", "")
+        parts = [
+            "<html><head><title>Stub page</title></head><body>",
+            "<header><nav>Home | Destinations | Sign in</nav></header>",
+            "<p>We use cookies to improve your experience. Accept all cookies.</p>",
+            f"<h1>Travel notes for {url}</h1>"
+        ]
+        size, index = 0, 0
+        while size < self.page_kb * 1024:
+            paragraph = f"<h2>Section {index}</h2><p>{filler(80, f'{url}-{index}')}.</p>"
+            parts.append(paragraph)
+            size += len(paragraph)
+            index += 1
+        parts.append("<footer>Copyright Stub Travel. Share on Facebook. Follow us.</footer></body></html>")
+        return 200, "text/html", "".join(parts)
+
+
+class LLMStub(StubServer):
+    """
+    OpenAI-compatible chat completion endpoint.
+
+    When the request offers tools, the first `tool_calls` turns of a
+    conversation call them in turn (so the search and scrape paths are
+    exercised); after that, or without tools, it returns a final answer of
+    about `tokens` tokens.
+    """
+    name = "llm"
+
+    def __init__(self, latency="0", tokens=400, tool_calls=2):
+        super().__init__(latency)
+        self.tokens = tokens
+        self.tool_calls = tool_calls
+
+    def respond(self, path, body):
+        request = json.loads(body or b"{}")
+        messages = request.get("messages", [])
+        tools = request.get("tools") or []
+        prompt_tokens = sum(len(str(m.get("content") or "")) for m in messages) // 4
+        tool_turns = sum(1 for m in messages if m.get("role") == "tool")
+
+        if tools and tool_turns < self.tool_calls:
+            function = tools[tool_turns % len(tools)]["function"]
+            message = {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [{
+                    "id": f"call_{uuid.uuid4().hex[:12]}",
+                    "type": "function",
+                    "function": {"name": function["name"], "arguments": json.dumps(self._arguments(function, self._seed(messages)))}
+                }]
+            }
+            finish_reason, completion_tokens = "tool_calls", 20
+        else:
+            text = filler(self.tokens * 3 // 4, prompt_tokens)
+            message = {"role": "assistant", "content": f"Thought: I now know the final answer\nFinal Answer: {text}"}
+            finish_reason, completion_tokens = "stop", self.tokens
+        self.count(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+        return 200, "application/json", json.dumps({
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        })
+
+    @staticmethod
+    def _seed(messages):
+        # Distinct per conversation (the opening messages carry the trip), so tool results are not all cache hits
+        return zlib.crc32(json.dumps(messages[:2], sort_keys=True, default=str).encode()) + len(messages)
+
+    @staticmethod
+    def _arguments(function, seed):
+        # Fill the required string arguments of a tool schema with plausible values
+        schema = function.get("parameters") or {}
+        arguments = {}
+        for name in schema.get("required") or list(schema.get("properties") or {}):
+            if "url" in name or "website" in name:
+                arguments[name] = f"https://example.com/page/{seed}"
+            elif "operation" in name:
+                arguments[name] = "120 * 3"
+            else:
+                arguments[name] = f"best local food and hotels {seed}"
+        return arguments
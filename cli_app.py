@@ -1,9 +1,15 @@
 import logging
-from crewai import Crew, LLM
-from trip_agents import TripAgents
-from trip_tasks import TripTasks
+from trip_planner import TripPlanner
+from trip_cache import fresh_run, trip_fingerprint, trip_result_cache
+from trip_trace import recording
+from trip_budget import metered
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import argparse
+import json
+import os
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -27,54 +33,40 @@ class TripCrew():
         self.cities = cities
         self.date_range = date_range
         self.interests = interests
-        self.llm = LLM(model="gemini/gemini-2.0-flash")
+        # Token usage, cost and budget state of the last run (see trip_budget.py)
+        self.usage = None
 
     def run(self):
         """
-        Runs the trip planning process by initializing agents, tasks, and Crew.
+        Returns the trip plan, reusing a cached itinerary for an identical request
+        or joining one that is already being planned. Returns None if an error occurs.
+        """
+        fingerprint = trip_fingerprint(self.origin, self.cities, self.date_range, self.interests)
+        with metered() as budget:
+            result = trip_result_cache.get_or_run(fingerprint, self._plan)
+        self.usage = budget.usage()
+        return result
+
+    def run_traced(self, trace_path):
+        """
+        Plans the trip while recording its timeline, and writes it to `trace_path`
+        in Chrome trace-event format. The itinerary cache, stage checkpoints
+        and destination knowledge are bypassed so the trace shows a real run. Returns the trip plan or None.
+        """
+        with recording() as trace, metered() as budget, fresh_run():
+            result = self._plan()
+        self.usage = budget.usage()
+        trace.write(trace_path)
+        return result
+
+    def _plan(self):
+        """
+        Runs the identify -> gather -> plan pipeline, one crew per stage.
         Returns the generated trip plan or None if an error occurs.
         """
         try:
-            logging.info("Initializing agents and tasks")
-            agents = TripAgents()
-            tasks = TripTasks()
-
-            city_selector_agent = agents.city_selection_agent()
-            local_expert_agent = agents.local_expert()
-            travel_concierge_agent = agents.travel_concierge()
-
-            identify_task = tasks.identity_task(
-                city_selector_agent,
-                self.origin,
-                self.cities,
-                self.interests,
-                self.date_range
-            )
-
-            gather_task = tasks.gather_task(
-                local_expert_agent,
-                self.origin,
-                self.cities,
-                self.interests,
-                self.date_range
-            )
-
-            plan_task = tasks.plan_task(
-                travel_concierge_agent,
-                self.origin,
-                self.cities,
-                self.interests,
-                self.date_range
-            )
-
-            logging.info("Creating Crew and starting trip planning process")
-            crew = Crew(
-                agents=[city_selector_agent, local_expert_agent, travel_concierge_agent],
-                tasks=[identify_task, gather_task, plan_task],
-                verbose=True
-            )
-
-            result = crew.kickoff()
+            logging.info("Starting trip planning process")
+            result = TripPlanner().run(self.origin, self.cities, self.interests, self.date_range)
             logging.info("Trip planning completed successfully")
             return result
 
@@ -93,6 +85,129 @@ def validate_date(date_str):
     except ValueError:
         raise argparse.ArgumentTypeError("Invalid date format. Use YYYY-MM-DD")
 
+def parse_batch_line(line, line_number):
+    """
+    Parses and validates one JSONL batch request with the same rules as the single-trip flags.
+
+    Returns:
+        tuple: (request id, dict with origin, destination, date_range, interests)
+
+    Raises:
+        ValueError: If the line is malformed or fails validation.
+    """
+    try:
+        item = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Line {line_number}: invalid JSON ({e})")
+
+    missing = [field for field in ("origin", "destination", "start_date", "end_date", "interests") if not item.get(field)]
+    if missing:
+        raise ValueError(f"Line {line_number}: missing fields {', '.join(missing)}")
+
+    try:
+        start_date = validate_date(str(item["start_date"]))
+        end_date = validate_date(str(item["end_date"]))
+    except argparse.ArgumentTypeError as e:
+        raise ValueError(f"Line {line_number}: {e}")
+    if end_date <= start_date:
+        raise ValueError(f"Line {line_number}: End date must be after start date")
+
+    trip = {
+        "origin": item["origin"],
+        "destination": item["destination"],
+        "date_range": f"{start_date} to {end_date}",
+        "interests": item["interests"]
+    }
+    # Requests without an explicit id are identified by their fingerprint, which keeps resumes stable
+    request_id = str(item.get("id") or item.get("request_id") or trip_fingerprint(
+        trip["origin"], trip["destination"], trip["date_range"], trip["interests"]
+    ))
+    return request_id, trip
+
+def load_recorded_statuses(out_path):
+    """
+    Returns a mapping of request id -> last recorded status in the output file.
+    """
+    recorded = {}
+    if not os.path.exists(out_path):
+        return recorded
+    with open(out_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            recorded[record.get("id")] = record.get("status")
+    return recorded
+
+def plan_batch_item(request_id, trip):
+    """
+    Plans one batch request and returns its output record.
+    """
+    start = time.perf_counter()
+    logging.info(f"[{request_id}] Planning trip from {trip['origin']} to {trip['destination']} ({trip['date_range']})")
+    crew = TripCrew(trip["origin"], trip["destination"], trip["date_range"], trip["interests"])
+    result = crew.run()
+    status = ("PARTIAL" if crew.usage["partial"] else "SUCCESS") if result else "error"
+    return {
+        "id": request_id,
+        "status": status,
+        **trip,
+        "itinerary": result,
+        "error": None if result else "Failed to generate trip plan",
+        "usage": crew.usage,
+        "duration": round(time.perf_counter() - start, 2)
+    }
+
+def run_batch(batch_path, out_path, workers):
+    """
+    Plans every trip in a JSONL file concurrently and appends one JSON line per
+    request to `out_path` as soon as it finishes. Requests whose id already has a
+    successful result in `out_path` are skipped, so an interrupted batch can be resumed
+    (partial plans, cut short by the token budget, are planned again).
+
+    Returns:
+        dict: Counts of succeeded, partial, failed, invalid and skipped requests.
+    """
+    recorded = load_recorded_statuses(out_path)
+    counts = {"succeeded": 0, "partial": 0, "failed": 0, "invalid": 0, "skipped": 0}
+    write_lock = threading.Lock()
+
+    with open(batch_path) as f, open(out_path, "a") as out:
+        def write(record):
+            with write_lock:
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+
+        pending = {}
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                request_id, trip = parse_batch_line(line, line_number)
+            except ValueError as e:
+                logging.error(str(e))
+                counts["invalid"] += 1
+                # Report each invalid line once, even across resumed runs
+                if recorded.get(f"line-{line_number}") != "invalid":
+                    write({"id": f"line-{line_number}", "status": "invalid", "error": str(e)})
+                continue
+            if recorded.get(request_id) == "SUCCESS" or request_id in pending:
+                counts["skipped"] += 1
+                continue
+            pending[request_id] = trip
+
+        logging.info(f"Planning {len(pending)} trips with {workers} workers ({counts['skipped']} already done)")
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as executor:
+            futures = [executor.submit(plan_batch_item, request_id, trip) for request_id, trip in pending.items()]
+            for future in as_completed(futures):
+                record = future.result()
+                write(record)
+                counts[{"SUCCESS": "succeeded", "PARTIAL": "partial"}.get(record["status"], "failed")] += 1
+                logging.info(f"[{record['id']}] {record['status']} in {record['duration']}s")
+
+    return counts
+
 def main():
     """
     Entry point for the CLI application.
@@ -100,14 +215,35 @@ def main():
     """
     parser = argparse.ArgumentParser(description="AI Travel Planner")
 
-    parser.add_argument('--origin', '-o', type=str, required=True, help="Origin city")
-    parser.add_argument('--destination', '-d', type=str, required=True, help="Destination city/cities")
-    parser.add_argument('--start-date', '-s', type=validate_date, required=True, help="Trip start date (YYYY-MM-DD)")
-    parser.add_argument('--end-date', '-e', type=validate_date, required=True, help="Trip end date (YYYY-MM-DD)")
-    parser.add_argument('--interests', '-i', type=str, required=True, help="Travel interests (comma-separated)")
+    parser.add_argument('--origin', '-o', type=str, help="Origin city")
+    parser.add_argument('--destination', '-d', type=str, help="Destination city/cities")
+    parser.add_argument('--start-date', '-s', type=validate_date, help="Trip start date (YYYY-MM-DD)")
+    parser.add_argument('--end-date', '-e', type=validate_date, help="Trip end date (YYYY-MM-DD)")
+    parser.add_argument('--interests', '-i', type=str, help="Travel interests (comma-separated)")
+    parser.add_argument('--batch', '-b', type=str, help="JSONL file of trip requests to plan in parallel")
+    parser.add_argument('--out', type=str, default="results.jsonl", help="JSONL file receiving batch results (default: results.jsonl)")
+    parser.add_argument('--workers', '-w', type=int, default=4, help="Number of trips planned concurrently in batch mode")
+    parser.add_argument('--trace', type=str, help="Write a Chrome trace-event timeline of the run to this JSON file")
 
     args = parser.parse_args()
 
+    if args.batch and args.trace:
+        parser.error("--trace records a single trip and cannot be combined with --batch")
+
+    if args.batch:
+        print(f"\nTravAgent - planning batch {args.batch} -> {args.out} with {args.workers} workers")
+        counts = run_batch(args.batch, args.out, max(1, args.workers))
+        print(f"Done: {counts['succeeded']} succeeded, {counts['partial']} partial, {counts['failed']} failed, "
+              f"{counts['invalid']} invalid, {counts['skipped']} skipped")
+        return
+
+    missing = [flag for flag, value in (
+        ("--origin", args.origin), ("--destination", args.destination), ("--start-date", args.start_date),
+        ("--end-date", args.end_date), ("--interests", args.interests)
+    ) if not value]
+    if missing:
+        parser.error(f"the following arguments are required: {', '.join(missing)} (or use --batch)")
+
     # Validate date range
     if args.end_date <= args.start_date:
         logging.error("End date must be after start date")
@@ -129,7 +265,12 @@ def main():
 
     # Initialize and run the trip planner
     trip_crew = TripCrew(args.origin, args.destination, date_range, args.interests)
-    result = trip_crew.run()
+    result = trip_crew.run_traced(args.trace) if args.trace else trip_crew.run()
+    if args.trace:
+        print(f"\nTimeline written to {args.trace} (open it in chrome://tracing or https://ui.perfetto.dev)")
+    usage = trip_crew.usage
+    print(f"\nLLM usage: {usage['llm_calls']} calls, ~{usage['total_tokens']} tokens, ~${usage['cost_usd']:.4f} "
+          f"(budget {usage['budget_status']})")
 
     # Output the result
     if result:
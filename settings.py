@@ -0,0 +1,82 @@
+import os
+import sys
+import logging
+from functools import lru_cache
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def get_secret(name, default=None):
+    """
+    Looks up a secret or config value.
+
+    Environment variables (including those loaded from .env) take precedence.
+    Streamlit secrets are consulted only when the process is already running
+    inside Streamlit, so the API and CLI never import the Streamlit stack.
+
+    Args:
+        name (str): Name of the secret, e.g. "SERPER_API_KEY".
+        default: Value returned when the secret is not configured anywhere.
+
+    Returns:
+        The secret value, or `default`.
+    """
+    value = os.getenv(name)
+    if value:
+        return value
+    if "streamlit" in sys.modules:
+        try:
+            import streamlit as st
+            return st.secrets[name]
+        except Exception:
+            pass
+    return default
+
+
+def require_secret(name):
+    """
+    Same as get_secret() but raises if the secret is missing.
+    When replaying a cassette (see tools/cassette.py) no upstream is
+    called, so a placeholder is returned instead.
+
+    Raises:
+        KeyError: If the secret is not configured.
+    """
+    value = get_secret(name)
+    if not value and os.getenv("CASSETTE_PATH") and os.getenv("CASSETTE_MODE", "replay") == "replay":
+        return f"replay-{name.lower()}"
+    if not value:
+        logger.error("Missing required secret: %s", name)
+        raise KeyError(f"{name} is not configured (set it in the environment, .env or Streamlit secrets)")
+    return value
+
+
+# Settings class to load API keys and runtime options
+class Settings:
+    def __init__(self):
+        self.GEMINI_API_KEY = get_secret("GEMINI_API_KEY")
+        self.SERPER_API_KEY = get_secret("SERPER_API_KEY")
+        self.BROWSERLESS_API_KEY = get_secret("BROWSERLESS_API_KEY")
+        # Number of trips planned concurrently per API process (a batch counts each trip it plans in parallel);
+        # LLM_CONCURRENCY bounds the LLM calls they make together
+        self.TRIP_WORKERS = int(os.getenv("TRIP_WORKERS", "4"))
+        # Trips allowed to wait for a worker before requests are rejected with 429 (negative for no limit)
+        self.TRIP_QUEUE_DEPTH = int(os.getenv("TRIP_QUEUE_DEPTH", "16"))
+        # Planning requests per minute allowed per client, with bursts up to CLIENT_RATE_BURST (0 disables)
+        self.CLIENT_RATE_LIMIT = float(os.getenv("CLIENT_RATE_LIMIT", "0"))
+        self.CLIENT_RATE_BURST = int(os.getenv("CLIENT_RATE_BURST", "0"))
+        # How long finished jobs stay available for polling (seconds)
+        self.JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+        # Maximum number of trips accepted by the batch endpoint
+        self.BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50"))
+
+# Cached settings loader
+@lru_cache()
+def get_settings():
+    return Settings()
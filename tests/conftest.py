@@ -0,0 +1,18 @@
+"""
+Points the app at the local benchmark stubs (benchmarks/stubs.py) before any
+app module is imported, and keeps every cache in memory.
+"""
+import os
+import tempfile
+
+from benchmarks.e2e import configure_environment
+from benchmarks.stubs import BrowserlessStub, LLMStub, SerperStub
+
+STUBS = [SerperStub().start(), BrowserlessStub(page_kb=5).start(), LLMStub(latency="0.05", tokens=60, tool_calls=1).start()]
+configure_environment(*STUBS)
+os.environ["TRIP_DATA_DIR"] = tempfile.mkdtemp(prefix="trip-tests-")
+
+
+def pytest_unconfigure(config):
+    for stub in STUBS:
+        stub.stop()
@@ -0,0 +1,44 @@
+import time
+
+from tools.cache import SQLiteCacheBackend, TTLCache
+
+
+def test_entries_expire_after_ttl():
+    cache = TTLCache("test_ttl", ttl=60)
+    cache.set("short", "value", ttl=0.05)
+    cache.set("long", "value")
+    time.sleep(0.1)
+
+    assert cache.get("short") is None
+    assert cache.get("long") == "value"
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache("test_lru", max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+
+def test_sqlite_tier_survives_a_new_cache(tmp_path):
+    path = str(tmp_path / "nested" / "cache.db")
+    TTLCache("test_sqlite_writer", backend=SQLiteCacheBackend(path)).set("plan", {"days": 3})
+
+    reader = TTLCache("test_sqlite_reader", backend=SQLiteCacheBackend(path))
+    assert reader.get("plan") == {"days": 3}
+    assert reader.stats()["disk_hits"] == 1
+    # Promoted into memory: the next lookup does not touch the disk
+    assert reader.get("plan") == {"days": 3}
+    assert reader.stats()["disk_hits"] == 1
+
+
+def test_sqlite_tier_drops_expired_entries(tmp_path):
+    path = str(tmp_path / "cache.db")
+    TTLCache("test_sqlite_expired_writer", backend=SQLiteCacheBackend(path)).set("plan", "old", ttl=0.05)
+    time.sleep(0.1)
+
+    assert TTLCache("test_sqlite_expired_reader", backend=SQLiteCacheBackend(path)).get("plan") is None
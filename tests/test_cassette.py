@@ -0,0 +1,74 @@
+"""
+Records a full CLI planning run against the benchmark stubs, then replays it
+offline (stubs stopped, no API keys) and checks the itinerary is identical.
+"""
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.stubs import BrowserlessStub, LLMStub, SerperStub
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PLAN = """
+import json, sys
+import cli_app
+crew = cli_app.TripCrew("Bangalore, India", "Goa; Pondicherry", "2025-05-01 to 2025-05-05", "food and beaches")
+with open(sys.argv[1], "w") as f:
+    json.dump(crew.run(), f)
+"""
+
+
+def plan(env, cwd, name):
+    out = os.path.join(cwd, f"{name}.json")
+    completed = subprocess.run(
+        [sys.executable, "-c", PLAN, out], cwd=cwd, env=env, capture_output=True, text=True, timeout=600
+    )
+    assert completed.returncode == 0, completed.stderr[-2000:]
+    with open(out) as f:
+        return json.load(f)
+
+
+def test_record_then_replay_offline(tmp_path):
+    # Tool calls on every agent turn exercise native function calling
+    stubs = [SerperStub().start(), BrowserlessStub(page_kb=5).start(), LLMStub(tokens=60, tool_calls=2).start()]
+    serper, browserless, llm = stubs
+    cassette = str(tmp_path / "run.jsonl")
+    env = {
+        **os.environ,
+        "PYTHONPATH": ROOT,
+        "SERPER_URL": f"{serper.url}/search",
+        "BROWSERLESS_URL": f"{browserless.url}/content",
+        "LLM_MODEL": "openai/gpt-4o-mini",
+        "LLM_BASE_URL": f"{llm.url}/v1",
+        "CASSETTE_PATH": cassette,
+        "CHECKPOINT_CACHE_PATH": "",
+        "TRIP_DATA_DIR": str(tmp_path)
+    }
+    for name in ("SEARCH_CACHE_PATH", "TRIP_CACHE_PATH", "DESTINATION_CACHE_PATH",
+                 "BROWSER_PAGE_CACHE_PATH", "BROWSER_SUMMARY_CACHE_PATH"):
+        env.pop(name, None)
+
+    try:
+        recorded = plan({
+            **env, "CASSETTE_MODE": "record",
+            "SERPER_API_KEY": "stub", "BROWSERLESS_API_KEY": "stub", "LLM_API_KEY": "stub"
+        }, tmp_path, "recorded")
+        assert llm.snapshot()["requests"] > 0
+    finally:
+        for stub in stubs:
+            stub.stop()
+
+    with open(cassette) as f:
+        entries = [json.loads(line) for line in f]
+    assert any(isinstance(e.get("response"), dict) and e["response"].get("tool_calls") for e in entries)
+
+    # Offline: the stubs are gone and no credentials are configured
+    replay_env = {**env, "CASSETTE_MODE": "replay"}
+    for name in ("SERPER_API_KEY", "BROWSERLESS_API_KEY", "LLM_API_KEY", "OPENAI_API_KEY", "GEMINI_API_KEY"):
+        replay_env.pop(name, None)
+    replayed = plan(replay_env, tmp_path, "replayed")
+
+    assert recorded
+    assert replayed == recorded
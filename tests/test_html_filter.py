@@ -0,0 +1,38 @@
+from tools.html_filter import filter_elements
+
+
+class Element():
+    def __init__(self, text, category):
+        self.text = text
+        self.category = category
+
+    def __str__(self):
+        return self.text
+
+
+def test_filter_drops_chrome_and_keeps_content():
+    elements = [
+        Element("Site Name", "Header"),
+        Element("Open 9am-5pm", "ListItem"),
+        "Accept all cookies",
+        "Home",
+        Element("The old town is best explored on foot in the early morning.", "NarrativeText"),
+        Element("Sign in to save this page", "ListItem"),
+        Element("Sign in to save this page", "ListItem"),
+        Element("© 2025", "Footer")
+    ]
+    kept, stats = filter_elements(elements)
+
+    assert kept == ["Open 9am-5pm", "The old town is best explored on foot in the early morning."]
+    assert stats.dropped_category == 2
+    assert stats.dropped_boilerplate == 3
+    assert stats.dropped_short == 1
+    assert stats.chars_saved > 0
+
+
+def test_filter_keeps_first_copy_of_repeated_text():
+    paragraph = "Ferries to the islands leave from the main pier every hour in high season."
+    kept, stats = filter_elements([Element(paragraph, "NarrativeText"), Element(paragraph, "NarrativeText")])
+
+    assert kept == [paragraph]
+    assert stats.dropped_duplicate == 1
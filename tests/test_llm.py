@@ -0,0 +1,64 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from crewai.llms.base_llm import BaseLLM
+
+from tools import llm as llm_module
+from tools.llm import MeteredLLM, llm_calls_in_flight, llm_slot
+from trip_events import submit_with_context
+
+
+class ScriptedLLM(BaseLLM):
+    """
+    Answers with a fixed text, or runs the "scrape" tool inside the call as crewai's native providers do.
+    """
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        if available_functions:
+            return available_functions["scrape"]()
+        slot = getattr(llm_module._local, "slot", None)
+        return "summary in own slot" if slot is not None and slot.held else "summary"
+
+
+@pytest.fixture
+def one_slot(monkeypatch):
+    monkeypatch.setattr(llm_module, "_llm_slots", threading.BoundedSemaphore(1))
+    return llm_module._llm_slots
+
+
+def test_nested_call_on_same_thread_reuses_slot(one_slot):
+    with llm_slot() as outer:
+        with llm_slot() as inner:
+            assert inner is None
+        assert outer.held and llm_calls_in_flight() == 1
+    assert llm_calls_in_flight() == 0
+
+
+def test_worker_threads_take_their_own_slot(monkeypatch):
+    monkeypatch.setattr(llm_module, "_llm_slots", threading.BoundedSemaphore(2))
+
+    def take_slot():
+        with llm_slot() as slot:
+            return slot is not None and llm_calls_in_flight() == 2
+
+    with llm_slot():
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            # The copied context does not carry the caller's slot
+            assert submit_with_context(executor, take_slot).result(5)
+
+
+def test_tool_summaries_take_slots_while_the_call_lends_its_own(one_slot):
+    llm = MeteredLLM(ScriptedLLM(model="scripted"))
+    summaries = []
+
+    def scrape():
+        # Page summaries run on worker threads, each needing a slot
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [submit_with_context(executor, llm.call, "chunk") for _ in range(2)]
+            summaries.extend(future.result(5) for future in futures)
+        return "page"
+
+    assert llm.call("find hotels", available_functions={"scrape": scrape}) == "page"
+    assert summaries == ["summary in own slot", "summary in own slot"]
+    assert llm_calls_in_flight() == 0
+    assert one_slot.acquire(blocking=False)
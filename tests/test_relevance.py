@@ -0,0 +1,26 @@
+from tools.relevance import BM25, select_relevant
+
+
+TEXTS = [
+    "The museum opens at nine.",
+    "Cheap hotels cluster near the station; most hotels include breakfast.",
+    "Street food stalls open after dark.",
+    "Our boutique hotel has a rooftop pool."
+]
+
+
+def test_bm25_ranks_matching_documents_first():
+    scores = BM25(TEXTS).scores("hotel")
+
+    assert scores[0] == scores[2] == 0
+    # Plural stemming: "hotels" matches, and more matches rank higher
+    assert scores[1] > scores[3] > 0
+
+
+def test_select_relevant_keeps_document_order():
+    assert select_relevant(TEXTS, "hotel breakfast") == [TEXTS[1], TEXTS[3]]
+    assert select_relevant(TEXTS, "hotel", top_k=1) == [TEXTS[1]]
+
+
+def test_select_relevant_keeps_page_without_match():
+    assert select_relevant(TEXTS, "skiing") == TEXTS
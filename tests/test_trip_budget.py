@@ -0,0 +1,35 @@
+import pytest
+
+from trip_budget import DEGRADED, EXCEEDED, OK, BudgetExceeded, TokenBudget, budget_degraded, metered
+
+
+def test_soft_budget_degrades_the_run():
+    budget = TokenBudget(soft_tokens=100, hard_tokens=1000)
+    budget.charge(40, 20)
+    assert budget.status == OK
+
+    with metered(budget):
+        budget.charge(30, 10)
+        assert budget.status == DEGRADED and budget_degraded()
+        budget.check()
+    assert budget.remaining == 900
+
+
+def test_hard_budget_refuses_further_calls():
+    budget = TokenBudget(soft_tokens=0, hard_tokens=100)
+    budget.charge(80, 20)
+
+    assert budget.status == EXCEEDED and budget.degraded
+    with pytest.raises(BudgetExceeded):
+        budget.check()
+    assert budget.usage()["refused_llm_calls"] == 1
+
+
+def test_absorb_adds_a_share_of_shared_work():
+    shared = TokenBudget(soft_tokens=0, hard_tokens=0)
+    shared.charge(300, 100)
+    shared.charge(300, 100)
+    trip = TokenBudget(soft_tokens=0, hard_tokens=0)
+    trip.absorb(shared, share=0.5)
+
+    assert (trip.prompt_tokens, trip.completion_tokens, trip.llm_calls) == (300, 100, 1)
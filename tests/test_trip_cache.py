@@ -0,0 +1,155 @@
+import threading
+import time
+
+import pytest
+
+import api_app
+from trip_budget import BudgetExceeded, TokenBudget, current_budget, metered
+from trip_cache import (
+    DestinationKnowledge, SingleFlight, StageCheckpoints, TripResultCache, fresh_run, trip_fingerprint, trip_result_cache
+)
+from tools.cache import TTLCache
+
+
+def test_single_flight_shares_one_run():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    runs, results = [], []
+
+    def fn():
+        runs.append(1)
+        started.set()
+        release.wait(5)
+        return "plan"
+
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", fn)))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(flight.do("k", fn)))
+    follower.start()
+    time.sleep(0.1)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert runs == [1]
+    assert sorted(results) == [("plan", False), ("plan", True)]
+
+
+def test_single_flight_shares_exceptions():
+    flight = SingleFlight()
+    with pytest.raises(ValueError):
+        flight.do("k", lambda: (_ for _ in ()).throw(ValueError("boom")))
+    # The key is free again once the run finished
+    assert flight.do("k", lambda: "again") == ("again", False)
+
+
+def run_joined(cache, key, leader_fn, joiner_fn, leader_budget, joiner_budget):
+    """
+    Runs `leader_fn` under `key`, and `joiner_fn` for the same key once the leader is in flight.
+    """
+    in_flight = threading.Event()
+    outcome = {}
+
+    def leader():
+        def fn():
+            in_flight.set()
+            time.sleep(0.2)
+            return leader_fn()
+        with metered(leader_budget):
+            try:
+                outcome["leader"] = cache.get_or_run(key, fn)
+            except Exception as e:
+                outcome["leader"] = e
+
+    def joiner():
+        in_flight.wait(5)
+        with metered(joiner_budget):
+            outcome["joiner"] = cache.get_or_run(key, joiner_fn)
+
+    threads = [threading.Thread(target=leader), threading.Thread(target=joiner)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(120)
+    return outcome
+
+
+def test_joiner_replans_after_degraded_leader():
+    cache = TripResultCache(TTLCache("test_trips_degraded"))
+    runs = []
+
+    def degraded():
+        runs.append("leader")
+        current_budget().charge(10, 0)
+        return "trimmed plan"
+
+    def planned():
+        runs.append("joiner")
+        return "full plan"
+
+    outcome = run_joined(cache, "k", degraded, planned, TokenBudget(soft_tokens=5), TokenBudget())
+
+    assert outcome == {"leader": "trimmed plan", "joiner": "full plan"}
+    assert runs == ["leader", "joiner"]
+    assert cache.cache.get("k") is None
+
+
+def test_joiner_shares_cacheable_result():
+    cache = TripResultCache(TTLCache("test_trips_shared"))
+    runs = []
+
+    def planned():
+        runs.append(1)
+        return "full plan"
+
+    outcome = run_joined(cache, "k", planned, planned, TokenBudget(), TokenBudget())
+
+    assert outcome == {"leader": "full plan", "joiner": "full plan"}
+    assert runs == [1]
+    assert cache.cache.get("k") == "full plan"
+
+
+def test_joiner_replans_when_leader_budget_runs_out():
+    # The real API crew: the leader's one-token budget runs out on its first LLM call
+    trip = ("Pune, India", "Udaipur, India", "2025-05-01 to 2025-05-02", "lakes and food")
+    key = trip_fingerprint(*trip)
+    leader_budget, joiner_budget = TokenBudget(hard_tokens=1), TokenBudget()
+
+    outcome = run_joined(
+        trip_result_cache, key,
+        api_app.TripCrew(trip[0], trip[1], trip[2], trip[3]).run,
+        api_app.TripCrew(trip[0], trip[1], trip[2], trip[3]).run,
+        leader_budget, joiner_budget
+    )
+
+    assert isinstance(outcome["leader"], BudgetExceeded)
+    assert isinstance(outcome["joiner"], str) and outcome["joiner"]
+    assert joiner_budget.llm_calls > 0
+    assert not joiner_budget.exceeded
+
+
+def test_checkpoints_skip_degraded_output():
+    checkpoints = StageCheckpoints(TTLCache("test_checkpoints"))
+    with metered(TokenBudget(soft_tokens=5)) as budget:
+        checkpoints.run("f", "identify", lambda: "full report")
+        budget.charge(10, 0)
+        checkpoints.run("f", "gather", lambda: "trimmed report")
+
+    assert checkpoints.get("f", "identify") == "full report"
+    assert checkpoints.get("f", "gather") is None
+
+
+def test_fresh_run_skips_checkpoints_and_knowledge():
+    checkpoints = StageCheckpoints(TTLCache("test_fresh_checkpoints"))
+    knowledge = DestinationKnowledge(TTLCache("test_fresh_knowledge"))
+    checkpoints.run("f", "identify", lambda: "saved report")
+    knowledge.get_or_run("Kyoto", "2025-06", lambda: "saved research")
+
+    with fresh_run():
+        assert checkpoints.run("f", "identify", lambda: "new report") == "new report"
+        assert knowledge.get_or_run("Kyoto", "2025-06", lambda: "new research") == "new research"
+
+    # Fresh outputs are still saved for later runs
+    assert checkpoints.run("f", "identify", lambda: "unused") == "new report"
+    assert knowledge.get_or_run("Kyoto", "2025-06", lambda: "unused") == "new research"
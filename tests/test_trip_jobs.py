@@ -0,0 +1,116 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from trip_jobs import ERROR, SUCCESS, JobManager, QueueFull, RateLimited, RateLimiter, TripJob
+
+
+@pytest.fixture
+def manager():
+    manager = JobManager(max_workers=1, retention_seconds=60, max_queue=1)
+    yield manager
+    manager.shutdown()
+
+
+def test_job_result_and_error(manager):
+    class HTTPError(Exception):
+        status_code, detail = 502, "upstream failed"
+
+    def fail():
+        raise HTTPError()
+
+    ok = manager.submit(lambda: "plan")
+    ok.future.result(5)
+    failed = manager.submit(fail)
+    failed.future.result(5)
+
+    assert (ok.status, ok.result) == (SUCCESS, "plan")
+    assert (failed.status, failed.error, failed.error_status) == (ERROR, "upstream failed", 502)
+    assert ok.finished_at is not None and failed.finished_at is not None
+
+
+def test_prune_drops_expired_jobs(manager):
+    job = manager.submit(lambda: "plan")
+    job.future.result(5)
+    job.finished_at = datetime.now() - timedelta(seconds=120)
+
+    manager.submit(lambda: None).future.result(5)
+    assert manager.get(job.id) is None
+
+
+def test_prune_skips_job_finishing_concurrently(manager):
+    # A job whose status is final but whose finished_at is not set yet must not break submit()
+    job = TripJob()
+    job.status = SUCCESS
+    manager._jobs[job.id] = job
+
+    manager.submit(lambda: None).future.result(5)
+    assert manager.get(job.id) is job
+
+
+def test_job_is_done_only_with_finished_at(manager):
+    release = threading.Event()
+    job = manager.submit(lambda: release.wait(5))
+    seen = []
+    # Poll from another thread while the job finishes
+    poller = threading.Thread(target=lambda: [seen.append((job.done, job.finished_at)) for _ in range(20000)])
+    poller.start()
+    release.set()
+    job.future.result(5)
+    poller.join()
+
+    assert all(finished_at is not None for done, finished_at in seen if done)
+
+
+def test_batch_slots_count_against_admission():
+    manager = JobManager(max_workers=2, retention_seconds=60, max_queue=1)
+    release, started, running = threading.Event(), threading.Event(), []
+
+    def work(name):
+        running.append(name)
+        started.set()
+        release.wait(5)
+
+    batch = manager.submit(work, "batch", slots=2)
+    assert started.wait(5)
+    single = manager.submit(work, "single")
+    # Both slots are held by the batch, so the single trip waits and the queue is full
+    with pytest.raises(QueueFull):
+        manager.submit(work, "rejected")
+    assert manager.stats()["running"] + manager.stats()["queued"] == 3
+    assert running == ["batch"]
+
+    release.set()
+    batch.future.result(5)
+    single.future.result(5)
+    assert running == ["batch", "single"]
+    manager.shutdown()
+
+
+def test_queue_full_rejects_with_retry_after(manager):
+    release = threading.Event()
+    running = manager.submit(release.wait, 5)
+    queued = manager.submit(lambda: "queued")
+
+    with pytest.raises(QueueFull) as rejected:
+        manager.submit(lambda: "rejected")
+    assert rejected.value.retry_after > 0
+
+    release.set()
+    running.future.result(5)
+    queued.future.result(5)
+    assert queued.result == "queued"
+    # Capacity is free again once the jobs finished
+    manager.submit(lambda: None).future.result(5)
+
+
+def test_rate_limiter_allows_burst_per_client():
+    limiter = RateLimiter(per_minute=60, burst=2)
+    limiter.acquire("a")
+    limiter.acquire("a")
+    with pytest.raises(RateLimited) as limited:
+        limiter.acquire("a")
+    assert 0 < limited.value.retry_after <= 1
+    # Other clients have their own bucket
+    limiter.acquire("b")
@@ -0,0 +1,38 @@
+from trip_cache import stage_fingerprint
+from trip_planner import split_candidate_cities, split_days, stage_dependencies
+
+
+def stage_key(stage, origin="Pune", cities="Goa", interests="food", date_range="2025-05-01 to 2025-05-04"):
+    return stage_fingerprint(stage, stage_dependencies(stage, origin, cities, interests, date_range))
+
+
+def test_interest_change_keeps_single_city_identify():
+    assert stage_key("identify", interests="beaches") == stage_key("identify")
+    assert stage_key("gather", interests="beaches") != stage_key("gather")
+
+
+def test_interest_change_reruns_multi_city_identify():
+    assert stage_key("identify", cities="Goa; Kochi", interests="beaches") != stage_key("identify", cities="Goa; Kochi")
+
+
+def test_date_shift_keeps_gather_but_refreshes_forecast():
+    shifted = "2025-05-03 to 2025-05-06"
+    assert stage_key("gather", date_range=shifted) == stage_key("gather")
+    assert stage_key("identify", date_range=shifted) != stage_key("identify")
+    assert stage_key("gather", date_range="2025-06-01 to 2025-06-04") != stage_key("gather")
+
+
+def test_split_days_covers_the_whole_range():
+    segments = split_days("2025-05-30 to 2025-06-03", 2)
+
+    assert [(s["first_day"], s["last_day"]) for s in segments] == [(1, 2), (3, 4), (5, 5)]
+    assert (segments[0]["start"], segments[-1]["end"]) == ("2025-05-30", "2025-06-03")
+    assert split_days("2025-06-03 to 2025-05-30", 2) == []
+    assert split_days("early June", 2) == []
+
+
+def test_split_candidate_cities():
+    assert split_candidate_cities("Tokyo, Japan") == ["Tokyo, Japan"]
+    assert split_candidate_cities("Kyoto or Osaka") == ["Kyoto", "Osaka"]
+    assert split_candidate_cities("Lisbon; Porto / lisbon") == ["Lisbon", "Porto"]
+    assert split_candidate_cities("Portland") == ["Portland"]
@@ -1,11 +1,20 @@
 import json
-import requests
-import streamlit as st
+import os
+from functools import lru_cache
 import logging
 from crewai.tools import BaseTool
+from trip_events import traced_tool, emit
+from trip_budget import current_budget
+from settings import require_secret
+from tools.cache import cache_from_env
+from tools.http_client import get_http_client
+from tools.llm import build_llm
+from tools.summarizer import PageSummarizer
+from tools.html_filter import filter_elements
+from tools.relevance import select_relevant
 from unstructured.partition.html import partition_html
-from crewai import Task, Agent, LLM
 from pydantic import BaseModel, Field
+from typing import Optional
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,11 +23,50 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# URL -> raw page HTML (configure with BROWSER_PAGE_CACHE_TTL / _MAX_ENTRIES / _PATH)
+page_cache = cache_from_env("browser_pages", "BROWSER_PAGE", default_ttl=3600, default_max_entries=256)
+# Chunk content hash -> summary for map and reduce passes
+# (configure with BROWSER_SUMMARY_CACHE_TTL / _MAX_ENTRIES / _PATH)
+summary_cache = cache_from_env("browser_summaries", "BROWSER_SUMMARY", default_ttl=7 * 24 * 3600, default_max_entries=4096)
+
+# Maximum number of chunks summarized concurrently per page
+SUMMARY_CONCURRENCY = int(os.getenv("BROWSER_SUMMARY_CONCURRENCY", "4"))
+# Token budget of each chunk sent to the summarizer, and of the final page summary
+CHUNK_TOKENS = int(os.getenv("BROWSER_CHUNK_TOKENS", "2000"))
+SUMMARY_TOKENS = int(os.getenv("BROWSER_SUMMARY_TOKENS", "800"))
+# Navigation-like or repeated elements shorter than this are treated as page chrome
+MIN_ELEMENT_CHARS = int(os.getenv("BROWSER_MIN_ELEMENT_CHARS", "25"))
+# With a focus query, keep at most this many elements within this token budget
+FOCUS_TOP_K = int(os.getenv("BROWSER_FOCUS_TOP_K", "40"))
+FOCUS_TOKENS = int(os.getenv("BROWSER_FOCUS_TOKENS", str(CHUNK_TOKENS)))
+# Chunks summarized per page once the trip is past its soft token budget
+DEGRADED_MAX_CHUNKS = int(os.getenv("BROWSER_DEGRADED_MAX_CHUNKS", "2"))
+
+# browserless.io content endpoint (point it at a compatible local service for testing)
+BROWSERLESS_URL = os.getenv("BROWSERLESS_URL", "https://chrome.browserless.io/content")
+
+@lru_cache()
+def get_summary_llm():
+    """
+    Returns the LLM shared by all page summarization agents in this process.
+    """
+    return build_llm()
+
+def normalize_url(website: str) -> str:
+    """
+    Normalizes a URL for page cache lookups (drops whitespace and fragments).
+    """
+    return website.strip().split("#", 1)[0]
+
 class WebsiteInput(BaseModel):
     """
     Defines the schema for the website scraping input.
     """
     website: str = Field(..., description="The website URL to scrape")
+    focus: Optional[str] = Field(
+        None,
+        description="Optional: what to look for on the page (e.g. 'hotel prices', 'events in May'); only the relevant parts are summarized"
+    )
 
 class BrowserTools(BaseTool):
     """
@@ -28,76 +76,80 @@ class BrowserTools(BaseTool):
     description: str = "Useful to scrape and summarize a website content"
     args_schema: type[BaseModel] = WebsiteInput
 
-    def _run(self, website: str) -> str:
+    @traced_tool
+    def _run(self, website: str, focus: Optional[str] = None) -> str:
         """
         Scrapes the content of a website and summarizes it using an LLM agent.
+        With a focus query, only the most relevant page elements are summarized.
         """
         try:
             logger.info(f"Starting website scraping for: {website}")
 
-            # Prepare API endpoint and headers for browserless.io
-            api_key = st.secrets["BROWSERLESS_API_KEY"]
-            url = f"https://chrome.browserless.io/content?token={api_key}"
-            payload = json.dumps({"url": website})
-            headers = {
-                "Cache-Control": "no-cache",
-                "Content-Type": "application/json"
-            }
-
-            logger.info("Sending POST request to browserless.io API")
-            response = requests.post(url, headers=headers, data=payload)
-
-            if response.status_code != 200:
-                logger.error(f"Search API request failed. Status Code: {response.status_code}")
-                return f"Error: Search API request failed. Status Code: {response.status_code}"
+            # Past the soft budget, pages are summarized from fewer chunks, and only if even that still fits
+            budget = current_budget()
+            max_chunks = None
+            if budget is not None and budget.degraded:
+                max_chunks = DEGRADED_MAX_CHUNKS
+                page_cost = DEGRADED_MAX_CHUNKS * (CHUNK_TOKENS + SUMMARY_TOKENS)
+                if budget.remaining is not None and budget.remaining < page_cost:
+                    logger.warning(f"Skipping scrape of {website}: {budget.remaining} tokens left in the trip budget")
+                    budget.note("skipped_scrapes")
+                    emit("scrape_skipped", website=website, remaining_tokens=budget.remaining)
+                    return "Scrape skipped: this trip's token budget is nearly used up. Rely on the information gathered so far."
+
+            page_key = normalize_url(website)
+            html = page_cache.get(page_key)
+            if html is not None:
+                logger.info(f"Page cache hit for: {website}")
+            else:
+                # Prepare API endpoint and headers for browserless.io
+                api_key = require_secret("BROWSERLESS_API_KEY")
+                url = f"{BROWSERLESS_URL}?token={api_key}"
+                payload = json.dumps({"url": website})
+                headers = {
+                    "Cache-Control": "no-cache",
+                    "Content-Type": "application/json"
+                }
+
+                logger.info("Sending POST request to browserless.io API")
+                response = get_http_client().post(url, headers=headers, data=payload)
+
+                if response.status_code != 200:
+                    logger.error(f"Search API request failed. Status Code: {response.status_code}")
+                    return f"Error: Search API request failed. Status Code: {response.status_code}"
+
+                html = response.text
+                page_cache.set(page_key, html)
 
             logger.info("Partitioning HTML content")
-            elements = partition_html(text=response.text)
-            content = "\n\n".join(str(el) for el in elements)
-
-            logger.info("Splitting content into manageable chunks")
-            chunk_size = 8000
-            content_chunks = [content[i:i+chunk_size] for i in range(0, len(content), chunk_size)]
-            summaries = []
-
-            logger.info("Initializing LLM model")
-            llm = LLM(model="gemini/gemini-2.0-flash")
-
-            for idx, chunk in enumerate(content_chunks):
-                logger.info(f"Processing chunk {idx+1}/{len(content_chunks)}")
-                agent = Agent(
-                    role="Principal Researcher",
-                    goal="Conduct in-depth research to gather accurate, relevant, and insightful information that supports strategic decision-making.",
-                    backstory=(
-                        "You are a highly analytical and detail-driven Principal Researcher with years of experience synthesizing complex information into actionable insights. "
-                        "Known for your methodical approach and critical thinking, you specialize in uncovering valuable patterns, trends, and data-driven stories. "
-                        "Your work enables teams to make informed choices across domains such as travel, business, technology, or policy. "
-                        "You prioritize clarity, accuracy, and relevance in every report you produce."
-                    ),
-                    allow_delegation=False,
-                    llm=llm
-                )
-
-                task = Task(
-                    description=(
-                        "You are tasked with performing high-quality background research on the assigned topic. "
-                        "This may include collecting data from reliable sources, summarizing key insights, comparing options, and identifying notable trends or considerations.\n\n"
-                        f"**Topic**: {chunk}\n\n"
-                        "Your goal is to:\n"
-                        "- Analyze credible, up-to-date sources.\n"
-                        "- Structure your findings clearly and concisely.\n"
-                        "- Ensure all data supports the decision or planning process that follows.\n\n"
-                        "Use a formal, well-organized tone and include references if relevant. Present your output as a research summary with headings, bullet points, and clear structure."
-                    ),
-                    agent=agent
-                )
-
-                logger.info(f"Executing summarization task for chunk {idx+1}")
-                summary = task.execute()
-                summaries.append(summary)
-
-            logger.info("Combining all summaries")
-            return "\n\n".join(summaries)
+            elements = partition_html(text=html)
+
+            logger.info("Stripping boilerplate and duplicate elements")
+            texts, stats = filter_elements(elements, min_chars=MIN_ELEMENT_CHARS)
+            emit("page_filtered", website=website, **stats.as_dict())
+            if not texts:
+                logger.warning("Filter removed every element; summarizing the unfiltered page")
+                texts = [str(el) for el in elements]
+
+            if focus:
+                logger.info(f"Ranking page elements for focus: {focus}")
+                texts = select_relevant(texts, focus, top_k=FOCUS_TOP_K, max_tokens=FOCUS_TOKENS)
+
+            summarizer = PageSummarizer(
+                llm_factory=get_summary_llm,
+                chunk_tokens=CHUNK_TOKENS,
+                summary_tokens=SUMMARY_TOKENS,
+                concurrency=SUMMARY_CONCURRENCY,
+                cache=summary_cache,
+                focus=focus,
+                max_chunks=max_chunks
+            )
+            summary = summarizer.summarize(texts)
+            if summarizer.trimmed:
+                budget.note("trimmed_pages")
+            logger.info(f"Page summarized with {summarizer.llm_calls} LLM calls")
+            emit("page_summarized", website=website, chunks=summarizer.chunks, llm_calls=summarizer.llm_calls)
+            return summary
 
         except Exception as e:
             logger.error(f"Error while processing the website: {str(e)}")
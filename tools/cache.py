@@ -0,0 +1,230 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Directory for default cache files, e.g. the stage checkpoints (explicit *_CACHE_PATH values are used as given)
+DEFAULT_DATA_DIR = "data"
+
+
+class SQLiteCacheBackend():
+    """
+    On-disk cache tier backed by a single SQLite table.
+
+    Entries survive process restarts and are shared by every process pointing at
+    the same file. The least recently used entries are evicted beyond `max_entries`.
+    The file (and its directory) is created on first use, not when the cache is built.
+    """
+    def __init__(self, path, max_entries=10000, table="cache"):
+        """
+        Args:
+            path (str): Location of the SQLite database file.
+            max_entries (int): Maximum number of rows kept in the table.
+            table (str): Table name, so several caches can share one file.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        # Opens the database on first use (caller holds the lock)
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            with conn:
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                    "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+                )
+            self._conn = conn
+            logger.info("SQLite cache '%s' opened at %s", self.table, self.path)
+        return self._conn
+
+    def get(self, key):
+        """
+        Returns `(value, expires_at)`, or None if the key is missing or expired.
+        """
+        now = time.time()
+        with self._lock, self._connect():
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, expires_at):
+        """
+        Stores a JSON-serializable value until `expires_at` (epoch seconds).
+        """
+        now = time.time()
+        with self._lock, self._connect():
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now)
+            )
+            self._evict(now)
+
+    def clear(self):
+        with self._lock, self._connect():
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+    def _evict(self, now):
+        # Expired rows go first, then the least recently used beyond the size limit
+        self._conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,))
+        self._conn.execute(
+            f"DELETE FROM {self.table} WHERE key IN ("
+            f"SELECT key FROM {self.table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+
+# Every TTLCache created in the process, by name (for stats and metrics)
+_registry = {}
+
+
+def registered_caches():
+    """
+    Returns all caches created in this process.
+    """
+    return list(_registry.values())
+
+
+class TTLCache():
+    """
+    Thread-safe LRU cache with per-entry TTL and an optional persistent tier.
+
+    Lookups check the in-memory LRU first and fall back to the SQLite backend
+    (if configured), promoting disk hits into memory.
+    """
+    def __init__(self, name, max_entries=1024, ttl=3600, backend=None):
+        """
+        Args:
+            name (str): Cache name used in logs and stats.
+            max_entries (int): Maximum number of entries held in memory.
+            ttl (float): Default time-to-live of an entry in seconds.
+            backend (SQLiteCacheBackend): Optional on-disk tier.
+        """
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        _registry[name] = self
+
+    def get(self, key):
+        """
+        Returns the cached value for `key`, or None on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        if self.backend is not None:
+            try:
+                entry = self.backend.get(key)
+            except Exception as e:
+                logger.error("Cache '%s' backend read failed: %s", self.name, e)
+                entry = None
+            if entry is not None:
+                value, expires_at = entry
+                with self._lock:
+                    self.hits += 1
+                    self.disk_hits += 1
+                    self._store(key, value, expires_at)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value, ttl=None):
+        """
+        Stores `value` under `key` for `ttl` seconds (defaults to the cache TTL).
+        """
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._store(key, value, expires_at)
+        if self.backend is not None:
+            try:
+                self.backend.set(key, value, expires_at)
+            except Exception as e:
+                logger.error("Cache '%s' backend write failed: %s", self.name, e)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        """
+        Returns hit/miss counters and the current in-memory size.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "size": len(self._entries),
+                "max_entries": self.max_entries
+            }
+
+    def _store(self, key, value, expires_at):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+def cache_from_env(name, prefix, default_ttl, default_max_entries=1024, default_path=None):
+    """
+    Builds a TTLCache configured from `<prefix>_CACHE_TTL`, `<prefix>_CACHE_MAX_ENTRIES`
+    and `<prefix>_CACHE_PATH` (enables the SQLite tier when set; an empty value
+    disables a `default_path`). A relative `default_path` is placed in the
+    `TRIP_DATA_DIR` directory (default `data`).
+    """
+    ttl = float(os.getenv(f"{prefix}_CACHE_TTL", default_ttl))
+    max_entries = int(os.getenv(f"{prefix}_CACHE_MAX_ENTRIES", default_max_entries))
+    if default_path:
+        default_path = os.path.join(os.getenv("TRIP_DATA_DIR", DEFAULT_DATA_DIR), default_path)
+    path = os.getenv(f"{prefix}_CACHE_PATH", default_path)
+    backend = None
+    if path:
+        backend = SQLiteCacheBackend(
+            path,
+            max_entries=int(os.getenv(f"{prefix}_CACHE_DISK_MAX_ENTRIES", max_entries * 10)),
+            table=name
+        )
+    logger.info("Cache '%s' configured: ttl=%ss, max_entries=%s, path=%s", name, ttl, max_entries, path)
+    return TTLCache(name, max_entries=max_entries, ttl=ttl, backend=backend)
@@ -1,4 +1,5 @@
 from crewai.tools import BaseTool
+from trip_events import traced_tool
 from pydantic import BaseModel, Field
 import logging
 from dotenv import load_dotenv
@@ -22,6 +23,7 @@ class CalculatorTools(BaseTool):
     )
     args_schema: type[BaseModel] = CalculationInput
 
+    @traced_tool
     def _run(self, operation: str) -> float:
         """
         Safely evaluates a mathematical expression provided as a string.
@@ -0,0 +1,352 @@
+import hashlib
+import importlib
+import json
+import logging
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Any
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from crewai.llms.base_llm import BaseLLM
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RECORD = "record"
+REPLAY = "replay"
+
+# Query parameters that carry credentials and never go into a cassette
+SECRET_PARAMS = {"token", "key", "api_key", "apikey"}
+
+# Message fields holding per-call ids; some providers derive them from object
+# addresses, so they are left out of interaction keys
+VOLATILE_FIELDS = {"id", "tool_call_id", "call_id", "toolUseId"}
+
+
+class CassetteMiss(LookupError):
+    """
+    Raised in replay mode when a call was never recorded.
+    """
+
+
+def sanitize_url(url):
+    """
+    Drops credential query parameters (e.g. browserless' ?token=) from a URL.
+    """
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k.lower() not in SECRET_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def tool_names(tools):
+    """
+    Names of the tool schemas offered to an LLM; the schemas themselves may
+    hold tool objects whose repr differs between processes.
+    """
+    names = []
+    for tool in tools or []:
+        if isinstance(tool, dict):
+            tool = tool.get("name") or tool.get("function", {}).get("name") or sorted(tool)
+        names.append(getattr(tool, "name", tool))
+    return names
+
+
+def _digest(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _stable(value):
+    # Messages without their volatile id fields
+    if isinstance(value, dict):
+        return {k: _stable(v) for k, v in value.items() if k not in VOLATILE_FIELDS}
+    if isinstance(value, (list, tuple)):
+        return [_stable(v) for v in value]
+    return value
+
+
+def encode_completion(result):
+    """
+    Converts an LLM completion into JSON data for the cassette.
+
+    Text is stored as is. Native function-calling responses (a list of
+    provider tool-call objects) are stored as structured data: the class of
+    each call with its field values, plus its id, function name and JSON
+    arguments, so replay can hand the agent the same objects.
+    """
+    if isinstance(result, str) or not isinstance(result, list):
+        return result if isinstance(result, str) else str(result)
+    from crewai.utilities.agent_utils import extract_tool_call_info
+    calls = []
+    for call in result:
+        info = extract_tool_call_info(call)
+        if info is None:
+            return str(result)
+        call_id, name, arguments = info
+        entry = {
+            "id": call_id,
+            "name": name,
+            "arguments": arguments if isinstance(arguments, str) else json.dumps(arguments)
+        }
+        if isinstance(call, dict):
+            entry["dict"] = call
+        elif hasattr(call, "model_dump"):
+            entry["class"] = f"{type(call).__module__}:{type(call).__qualname__}"
+            entry["fields"] = call.model_dump(mode="json")
+        calls.append(entry)
+    return {"tool_calls": calls}
+
+
+def decode_completion(recorded):
+    """
+    Rebuilds a completion stored by encode_completion().
+    """
+    if not isinstance(recorded, dict) or "tool_calls" not in recorded:
+        return recorded
+    return [_decode_tool_call(entry) for entry in recorded["tool_calls"]]
+
+
+def _decode_tool_call(entry):
+    if "dict" in entry:
+        return entry["dict"]
+    if "class" in entry:
+        module, _, name = entry["class"].partition(":")
+        try:
+            cls = importlib.import_module(module)
+            for part in name.split("."):
+                cls = getattr(cls, part)
+            return cls.model_validate(entry["fields"])
+        except Exception as e:
+            logger.warning("Could not rebuild %s (%s); replaying the tool call as a dict", entry["class"], e)
+    # OpenAI-style dict, understood by the agent executor for every provider
+    return {
+        "id": entry["id"],
+        "type": "function",
+        "function": {"name": entry["name"], "arguments": entry["arguments"]}
+    }
+
+
+class Cassette():
+    """
+    Records HTTP responses and LLM completions to a JSON Lines file and
+    replays them deterministically, so a full planning run can be repeated
+    offline without API keys or quota.
+
+    Interactions are keyed by a digest of the request (method, URL without
+    credentials and body; or model, messages without call ids and tool
+    schemas). A request recorded several times is replayed in recording
+    order, and the last recording is repeated once they run out. Completions
+    that are native tool calls are stored as structured data and rebuilt as
+    the same provider objects on replay.
+    """
+    def __init__(self, path, mode=REPLAY, latency="0"):
+        """
+        Args:
+            path (str): Cassette file (JSON Lines).
+            mode (str): "record" to call upstream and append, "replay" to serve from the file.
+            latency (str): Delay injected per replayed call: "recorded" to sleep
+                for the recorded duration, or a fixed number of seconds.
+        """
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.meta = {}
+        self._recorded = {}
+        self._played = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            self._load()
+        elif mode == REPLAY:
+            raise FileNotFoundError(f"Cassette not found: {path}")
+        logger.info("Cassette %s opened in %s mode (%s recorded interactions)", path, mode, sum(map(len, self._recorded.values())))
+
+    def _load(self):
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if entry["kind"] == "meta":
+                    self.meta[entry["name"]] = entry["value"]
+                else:
+                    self._recorded.setdefault(entry["key"], []).append(entry)
+
+    def _append(self, entry):
+        with self._lock:
+            if entry["kind"] != "meta":
+                self._recorded.setdefault(entry["key"], []).append(entry)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def record(self, kind, key, request, response, duration):
+        self._append({
+            "kind": kind,
+            "key": key,
+            "request": request,
+            "response": response,
+            "duration": round(duration, 4)
+        })
+
+    def set_meta(self, name, value):
+        """
+        Records a property of the recording environment (e.g. whether the LLM supports function calling).
+        """
+        if self.meta.get(name) != value:
+            self.meta[name] = value
+            self._append({"kind": "meta", "name": name, "value": value})
+
+    def play(self, kind, key, request):
+        """
+        Returns the next recorded response for `key`, after the configured latency.
+
+        Raises:
+            CassetteMiss: If the request was never recorded.
+        """
+        with self._lock:
+            entries = self._recorded.get(key)
+            if not entries:
+                raise CassetteMiss(f"No recorded {kind} interaction for {request}")
+            index = self._played.get(key, 0)
+            self._played[key] = index + 1
+            entry = entries[min(index, len(entries) - 1)]
+        self._wait(entry["duration"])
+        return entry["response"]
+
+    def _wait(self, recorded):
+        delay = recorded if self.latency == "recorded" else float(self.latency or 0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def http(self, method, url, body, send):
+        """
+        Records or replays one HTTP exchange.
+
+        Args:
+            method (str): HTTP method.
+            url (str): Request URL (credentials are stripped before keying/recording).
+            body (str): Request body, if any.
+            send (callable): Performs the real request; only called in record mode.
+
+        Returns:
+            requests.Response: The live or replayed response.
+        """
+        request = {"method": method, "url": sanitize_url(url), "body": body}
+        key = _digest("http", request)
+        if self.mode == REPLAY:
+            return self._build_response(self.play("http", key, f"{method} {request['url']}"), request["url"])
+
+        start = time.perf_counter()
+        response = send()
+        self.record("http", key, request, {
+            "status": response.status_code,
+            "headers": {k: v for k, v in response.headers.items() if k.lower() != "set-cookie"},
+            "body": response.text
+        }, time.perf_counter() - start)
+        return response
+
+    @staticmethod
+    def _build_response(recorded, url):
+        response = requests.Response()
+        response.status_code = recorded["status"]
+        response.headers = CaseInsensitiveDict(recorded["headers"])
+        response._content = recorded["body"].encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = url
+        return response
+
+    def llm(self, model, messages, tools, call):
+        """
+        Records or replays one LLM completion.
+
+        Args:
+            model (str): Model name.
+            messages: Prompt messages (string or list of message dicts).
+            tools: Tool schemas offered to the model, if any.
+            call (callable): Performs the real completion; only called in record mode.
+
+        Returns:
+            The live or replayed completion: text, or a list of tool calls.
+        """
+        key = _digest("llm", model, _stable(messages), tool_names(tools))
+        if self.mode == REPLAY:
+            return decode_completion(self.play("llm", key, f"completion from {model}"))
+
+        start = time.perf_counter()
+        result = call()
+        self.record("llm", key, {"model": model}, encode_completion(result), time.perf_counter() - start)
+        return result
+
+
+class CassetteLLM(BaseLLM):
+    """
+    LLM that records the completions of a wrapped LLM, or replays them
+    without constructing any provider client.
+    """
+    inner: Any = None
+    cassette: Any = None
+
+    def __init__(self, model, cassette, inner=None):
+        """
+        Args:
+            model (str): Model name of the wrapped LLM.
+            cassette (Cassette): Where completions are recorded or replayed from.
+            inner (BaseLLM): The real LLM (record mode only).
+        """
+        super().__init__(model=model)
+        self.inner = inner
+        self.cassette = cassette
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        if self.inner is not None and self.stop:
+            self.inner.stop = list(self.stop)
+        return self.cassette.llm(self.model, messages, tools, lambda: self.inner.call(
+            messages, tools=tools, callbacks=callbacks, available_functions=available_functions, **kwargs
+        ))
+
+    def supports_function_calling(self):
+        # Replay must take the same agent code path (and so send the same prompts) as the recording
+        name = f"{self.model}.supports_function_calling"
+        if self.inner is None:
+            return self.cassette.meta.get(name, False)
+        value = self.inner.supports_function_calling()
+        self.cassette.set_meta(name, value)
+        return value
+
+    def get_context_window_size(self):
+        if self.inner is None:
+            return super().get_context_window_size()
+        return self.inner.get_context_window_size()
+
+
+@lru_cache()
+def get_cassette():
+    """
+    Returns the process-wide Cassette configured from CASSETTE_PATH,
+    CASSETTE_MODE ("replay" by default) and CASSETTE_LATENCY, or None when
+    no cassette is configured.
+    """
+    path = os.getenv("CASSETTE_PATH")
+    if not path:
+        return None
+    return Cassette(path, mode=os.getenv("CASSETTE_MODE", REPLAY), latency=os.getenv("CASSETTE_LATENCY", "0"))
+
+
+def wrap_llm(model, factory):
+    """
+    Builds the LLM for `model`, routed through the cassette when one is configured.
+
+    Args:
+        model (str): Model name, e.g. "gemini/gemini-2.0-flash".
+        factory (callable): Builds the real LLM; not called in replay mode.
+    """
+    cassette = get_cassette()
+    if cassette is None:
+        return factory()
+    inner = factory() if cassette.mode == RECORD else None
+    return CassetteLLM(model, cassette, inner=inner)
@@ -0,0 +1,131 @@
+import hashlib
+import logging
+import re
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# unstructured element categories that carry page chrome rather than content
+DROPPED_CATEGORIES = {"Header", "Footer", "PageBreak", "PageNumber", "Image"}
+
+# Content categories: kept whatever their length or wording (a short "Open 9am-5pm daily"
+# list item is a useful fact), unless the same text repeats on the page like a menu entry
+CONTENT_CATEGORIES = {"NarrativeText", "ListItem", "Title", "Table", "FigureCaption"}
+
+# Typical template text: cookie banners, auth links, newsletter boxes, legal lines
+BOILERPLATE_PATTERN = re.compile(
+    r"\b(cookies?|accept all|privacy (policy|settings)|terms (of|and) (use|service|conditions)|"
+    r"sign (in|up)|log ?in|subscribe|newsletter|all rights reserved|skip to (main )?content|"
+    r"follow us|share (this|on)|back to top)\b",
+    re.IGNORECASE
+)
+
+# Boilerplate patterns only apply to short elements; long paragraphs are real content
+BOILERPLATE_MAX_CHARS = 200
+
+
+class FilterStats():
+    """
+    Counts what the pre-filter removed from a page.
+    """
+    def __init__(self):
+        self.elements_in = 0
+        self.elements_out = 0
+        self.chars_in = 0
+        self.chars_out = 0
+        self.dropped_category = 0
+        self.dropped_boilerplate = 0
+        self.dropped_short = 0
+        self.dropped_duplicate = 0
+
+    @property
+    def chars_saved(self):
+        return self.chars_in - self.chars_out
+
+    @property
+    def saved_ratio(self):
+        return self.chars_saved / self.chars_in if self.chars_in else 0.0
+
+    def as_dict(self):
+        return {
+            "elements_in": self.elements_in,
+            "elements_out": self.elements_out,
+            "chars_in": self.chars_in,
+            "chars_out": self.chars_out,
+            "chars_saved": self.chars_saved,
+            "saved_ratio": round(self.saved_ratio, 3),
+            "dropped_category": self.dropped_category,
+            "dropped_boilerplate": self.dropped_boilerplate,
+            "dropped_short": self.dropped_short,
+            "dropped_duplicate": self.dropped_duplicate
+        }
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizes element text for duplicate detection.
+    """
+    return " ".join(text.lower().split())
+
+
+def filter_elements(elements, min_chars=25):
+    """
+    Drops page chrome from partitioned HTML before it is summarized.
+
+    Removes elements in chrome categories (headers, footers, images, ...)
+    and repeated text blocks. Short template text (cookie banners, sign-in
+    links, share buttons) and short fragments are dropped only from
+    link- and navigation-like elements (uncategorized text, plain strings)
+    or from content elements whose text repeats on the page; narrative
+    text, list items, titles and tables are otherwise kept.
+
+    Args:
+        elements (list): Elements from `partition_html` (or plain strings), in order.
+        min_chars (int): Navigation-like or repeated elements shorter than this are dropped.
+
+    Returns:
+        tuple: (list of kept texts in document order, FilterStats)
+    """
+    stats = FilterStats()
+    seen = set()
+    kept = []
+    texts = [(str(element).strip(), getattr(element, "category", None)) for element in elements]
+    occurrences = {}
+    for text, _ in texts:
+        digest = hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+        occurrences[digest] = occurrences.get(digest, 0) + 1
+
+    for text, category in texts:
+        stats.elements_in += 1
+        stats.chars_in += len(text)
+
+        if not text:
+            continue
+        if category in DROPPED_CATEGORIES:
+            stats.dropped_category += 1
+            continue
+
+        digest = hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+        if category not in CONTENT_CATEGORIES or occurrences[digest] > 1:
+            if len(text) <= BOILERPLATE_MAX_CHARS and BOILERPLATE_PATTERN.search(text):
+                stats.dropped_boilerplate += 1
+                continue
+            if len(text) < min_chars:
+                stats.dropped_short += 1
+                continue
+
+        if digest in seen:
+            stats.dropped_duplicate += 1
+            continue
+        seen.add(digest)
+
+        kept.append(text)
+        stats.elements_out += 1
+        stats.chars_out += len(text)
+
+    logger.info(
+        f"Filtered page: kept {stats.elements_out}/{stats.elements_in} elements, "
+        f"saved {stats.chars_saved} of {stats.chars_in} chars ({stats.saved_ratio:.0%})"
+    )
+    return kept, stats
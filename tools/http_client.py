@@ -0,0 +1,139 @@
+import logging
+import os
+import random
+import time
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from tools.cassette import get_cassette
+from trip_events import emit
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Upstream responses that are worth retrying
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class HttpClient():
+    """
+    Shared HTTP transport for the tools.
+
+    Keeps pooled keep-alive connections per host, applies connect/read timeouts
+    to every call, retries 429/5xx and connection errors with jittered
+    exponential backoff, and logs the latency of each attempt.
+    """
+    def __init__(
+        self,
+        connect_timeout=5.0,
+        read_timeout=60.0,
+        max_retries=3,
+        backoff_base=0.5,
+        backoff_max=8.0,
+        pool_connections=10,
+        pool_maxsize=20
+    ):
+        """
+        Args:
+            connect_timeout (float): Seconds to wait for a TCP/TLS connection.
+            read_timeout (float): Seconds to wait for the server to respond.
+            max_retries (int): Retries after the first attempt (0 disables retrying).
+            backoff_base (float): Base delay of the exponential backoff in seconds.
+            backoff_max (float): Upper bound of a single backoff delay in seconds.
+            pool_connections (int): Number of per-host pools kept alive.
+            pool_maxsize (int): Maximum connections kept alive per host.
+        """
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method, url, **kwargs):
+        """
+        Sends a request through the pooled session, retrying transient failures.
+
+        Returns:
+            requests.Response: The last response received.
+
+        Raises:
+            requests.RequestException: If every attempt failed without a response.
+        """
+        cassette = get_cassette()
+        if cassette is not None:
+            return cassette.http(method, url, kwargs.get("data"), lambda: self._send(method, url, **kwargs))
+        return self._send(method, url, **kwargs)
+
+    def _send(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        target = self._describe(method, url)
+
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                logger.warning(f"{target} failed after {elapsed_ms:.0f} ms (attempt {attempt + 1}): {e}")
+                self._emit(method, url, "error", elapsed_ms, attempt)
+                if attempt >= self.max_retries:
+                    raise
+                self._sleep(attempt)
+                continue
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            logger.info(f"{target} -> {response.status_code} in {elapsed_ms:.0f} ms (attempt {attempt + 1})")
+            self._emit(method, url, response.status_code, elapsed_ms, attempt)
+            if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                return response
+            self._sleep(attempt, response.headers.get("Retry-After"))
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def _sleep(self, attempt, retry_after=None):
+        # Full jitter: a random delay up to the exponential cap, or the server's Retry-After
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after:
+            try:
+                delay = min(self.backoff_max, float(retry_after))
+            except ValueError:
+                pass
+        logger.info(f"Retrying in {delay:.2f}s")
+        time.sleep(delay)
+
+    @staticmethod
+    def _emit(method, url, status, elapsed_ms, attempt):
+        parts = urlsplit(url)
+        emit("http_request", method=method, host=parts.netloc, path=parts.path, status=status,
+             duration=round(elapsed_ms / 1000, 4), attempt=attempt + 1)
+
+    @staticmethod
+    def _describe(method, url):
+        # Log host and path only; query strings may carry API tokens
+        parts = urlsplit(url)
+        return f"{method} {parts.netloc}{parts.path}"
+
+
+@lru_cache()
+def get_http_client():
+    """
+    Returns the process-wide HttpClient configured from the environment.
+    """
+    return HttpClient(
+        connect_timeout=float(os.getenv("HTTP_CONNECT_TIMEOUT", "5")),
+        read_timeout=float(os.getenv("HTTP_READ_TIMEOUT", "60")),
+        max_retries=int(os.getenv("HTTP_MAX_RETRIES", "3")),
+        backoff_base=float(os.getenv("HTTP_BACKOFF_BASE", "0.5")),
+        backoff_max=float(os.getenv("HTTP_BACKOFF_MAX", "8")),
+        pool_maxsize=int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+    )
@@ -0,0 +1,228 @@
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any
+from crewai import LLM
+from crewai.llms.base_llm import BaseLLM
+from tools.cassette import wrap_llm
+from tools.summarizer import estimate_tokens
+from trip_events import emit
+from trip_budget import current_budget
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Model used by the agents and the page summarizer (any LiteLLM-style "provider/model" name)
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini/gemini-2.0-flash")
+
+# Alternative endpoint for the model, e.g. a local OpenAI-compatible server
+LLM_BASE_URL = os.getenv("LLM_BASE_URL")
+
+# Maximum LLM calls in flight per process, across every job, batch trip and their
+# parallel city scores, plan segments and page summaries (0 for no limit)
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+
+_llm_slots = threading.BoundedSemaphore(LLM_CONCURRENCY) if LLM_CONCURRENCY > 0 else None
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+# Slot held by the LLM call running on this thread. Kept per thread rather than
+# per context, so worker threads started from inside a call (e.g. page summaries)
+# take slots of their own
+_local = threading.local()
+
+
+def message_tokens(messages):
+    """
+    Estimates the prompt tokens of a string or a list of chat messages.
+    """
+    if isinstance(messages, str):
+        return estimate_tokens(messages)
+    return sum(estimate_tokens(str(message.get("content") or "")) for message in messages)
+
+
+def llm_calls_in_flight():
+    """
+    Returns the number of LLM calls currently holding a concurrency slot.
+    """
+    return _in_flight
+
+
+def _count_in_flight(delta):
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight += delta
+
+
+class LLMSlot():
+    """
+    One of the process-wide LLM_CONCURRENCY slots, held by an LLM call.
+
+    Providers run native tool calls inside the LLM call; while such a tool
+    runs the slot is lent back to the pool, so a page fetch does not hold it
+    and the tool's own LLM calls (page summaries) can take slots without
+    waiting on the call that started them.
+    """
+    def __init__(self):
+        self.wait = 0.0
+        self.held = False
+        self._lent = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        start = time.perf_counter()
+        _llm_slots.acquire()
+        self.wait += time.perf_counter() - start
+        self.held = True
+        _count_in_flight(1)
+
+    def release(self):
+        if self.held:
+            self.held = False
+            _llm_slots.release()
+            _count_in_flight(-1)
+
+    @contextmanager
+    def lent(self):
+        """
+        Returns the slot to the pool for the duration of the block and takes one again afterwards.
+        """
+        with self._lock:
+            self._lent += 1
+            if self._lent == 1:
+                self.release()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._lent -= 1
+                if self._lent == 0:
+                    self.acquire()
+
+    def lend(self, fn):
+        """
+        Wraps a tool function so the slot is lent out while it runs.
+        """
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            with self.lent():
+                return fn(*args, **kwargs)
+        return run
+
+
+@contextmanager
+def llm_slot():
+    """
+    Waits for one of the process-wide LLM_CONCURRENCY slots and holds it.
+    A call made on a thread that already holds a slot reuses it.
+
+    Yields:
+        LLMSlot: The slot, or None when there is no limit or the slot is reused.
+    """
+    current = getattr(_local, "slot", None)
+    if _llm_slots is None or (current is not None and current.held):
+        yield None
+        return
+    slot = LLMSlot()
+    slot.acquire()
+    _local.slot = slot
+    try:
+        yield slot
+    finally:
+        _local.slot = current
+        with slot._lock:
+            slot.release()
+
+
+class MeteredLLM(BaseLLM):
+    """
+    Wraps an LLM and emits an `llm_call` event per completion with its
+    latency, status and estimated prompt/completion tokens. Events carry the
+    tags of the calling context (e.g. the pipeline stage). The tokens are
+    charged to the current run's TokenBudget, which refuses the call once
+    the run's hard budget is spent.
+
+    Every call first takes one of the process-wide LLM_CONCURRENCY slots
+    (see LLMSlot), so the parallel fan-out of all running jobs together
+    stays within the provider's quota; the time spent waiting is reported
+    as `slot_wait`.
+    """
+    inner: Any = None
+
+    def __init__(self, inner):
+        """
+        Args:
+            inner (BaseLLM): The LLM that serves the completions.
+        """
+        super().__init__(model=inner.model)
+        self.inner = inner
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        # Agents set stop words on the LLM they were given; pass them through
+        if self.stop:
+            self.inner.stop = list(self.stop)
+        budget = current_budget()
+        if budget is not None:
+            budget.check()
+        with llm_slot() as slot:
+            if slot is not None and available_functions:
+                available_functions = {name: slot.lend(fn) for name, fn in available_functions.items()}
+            return self._metered_call(budget, slot, messages, tools, callbacks, available_functions, kwargs)
+
+    def _metered_call(self, budget, slot, messages, tools, callbacks, available_functions, kwargs):
+        start = time.perf_counter()
+        status, result = "ok", None
+        try:
+            result = self.inner.call(
+                messages, tools=tools, callbacks=callbacks, available_functions=available_functions, **kwargs
+            )
+            return result
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            prompt_tokens = message_tokens(messages)
+            completion_tokens = estimate_tokens(str(result)) if result is not None else 0
+            emit(
+                "llm_call",
+                model=self.model,
+                status=status,
+                duration=round(time.perf_counter() - start, 3),
+                slot_wait=round(slot.wait if slot is not None else 0.0, 3),
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens
+            )
+            if budget is not None:
+                budget.charge(prompt_tokens, completion_tokens)
+
+    def supports_function_calling(self):
+        return self.inner.supports_function_calling()
+
+    def supports_stop_words(self):
+        return self.inner.supports_stop_words()
+
+    def get_context_window_size(self):
+        return self.inner.get_context_window_size()
+
+
+def build_llm():
+    """
+    Builds the LLM client configured by LLM_MODEL / LLM_BASE_URL (and
+    LLM_API_KEY, when the provider's own key variable is not used),
+    routed through the record/replay cassette when one is configured and
+    metered for the metrics.
+    """
+    kwargs = {"model": LLM_MODEL}
+    if LLM_BASE_URL:
+        kwargs["base_url"] = LLM_BASE_URL
+    if os.getenv("LLM_API_KEY"):
+        kwargs["api_key"] = os.getenv("LLM_API_KEY")
+    logger.info("Building LLM client for %s%s", LLM_MODEL, f" at {LLM_BASE_URL}" if LLM_BASE_URL else "")
+    return MeteredLLM(wrap_llm(LLM_MODEL, lambda: LLM(**kwargs)))
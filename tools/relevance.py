@@ -0,0 +1,115 @@
+import logging
+import math
+import re
+from collections import Counter
+from tools.summarizer import estimate_tokens
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Words too common to say anything about relevance
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it",
+    "of", "on", "or", "that", "the", "this", "to", "was", "with", "what", "where", "when",
+    "how", "best", "find", "about", "into", "your", "you", "our", "we"
+}
+
+
+def stem(term: str) -> str:
+    """
+    Very light plural stemming so "hotels" matches "hotel".
+    """
+    if len(term) > 4 and term.endswith("ies"):
+        return term[:-3] + "y"
+    if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+        return term[:-1]
+    return term
+
+
+def tokenize(text: str) -> list:
+    """
+    Lowercases and splits text into stemmed terms, dropping stopwords.
+    """
+    return [stem(term) for term in TOKEN_PATTERN.findall(text.lower()) if term not in STOPWORDS]
+
+
+class BM25():
+    """
+    Okapi BM25 scorer over a small in-memory corpus (the elements of one page).
+    """
+    def __init__(self, documents, k1=1.5, b=0.75):
+        """
+        Args:
+            documents (list): Texts to score.
+            k1 (float): Term frequency saturation.
+            b (float): Length normalization strength.
+        """
+        self.k1 = k1
+        self.b = b
+        self.doc_terms = [Counter(tokenize(doc)) for doc in documents]
+        self.doc_lengths = [sum(terms.values()) for terms in self.doc_terms]
+        self.avg_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.doc_lengths else 0.0
+        document_frequency = Counter()
+        for terms in self.doc_terms:
+            document_frequency.update(terms.keys())
+        total = len(documents)
+        self.idf = {
+            term: math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+
+    def scores(self, query: str) -> list:
+        """
+        Returns the BM25 score of every document for `query`.
+        """
+        query_terms = set(tokenize(query))
+        results = []
+        for terms, length in zip(self.doc_terms, self.doc_lengths):
+            score = 0.0
+            for term in query_terms:
+                tf = terms.get(term, 0)
+                if not tf:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * length / (self.avg_length or 1))
+                score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            results.append(score)
+        return results
+
+
+def select_relevant(texts, query, top_k=40, max_tokens=2000):
+    """
+    Keeps the page elements most relevant to `query`.
+
+    Elements are ranked by BM25 and taken best-first until `top_k` elements or
+    `max_tokens` tokens are reached; the selection is returned in document order.
+
+    Args:
+        texts (list): Page element texts in document order.
+        query (str): What the agent is looking for on the page.
+        top_k (int): Maximum number of elements to keep.
+        max_tokens (int): Token budget of the kept elements.
+
+    Returns:
+        list: The selected texts, or all texts if nothing matches the query.
+    """
+    scores = BM25(texts).scores(query)
+    ranked = sorted((i for i, score in enumerate(scores) if score > 0), key=lambda i: scores[i], reverse=True)
+    if not ranked:
+        logger.info(f"No element matches focus '{query}'; keeping the whole page")
+        return list(texts)
+
+    selected, used_tokens = [], 0
+    for idx in ranked:
+        if len(selected) >= top_k:
+            break
+        tokens = estimate_tokens(texts[idx])
+        if selected and used_tokens + tokens > max_tokens:
+            continue
+        selected.append(idx)
+        used_tokens += tokens
+
+    logger.info(f"Focus '{query}': kept {len(selected)}/{len(texts)} elements (~{used_tokens} tokens)")
+    return [texts[i] for i in sorted(selected)]
@@ -1,8 +1,11 @@
 import json
-import requests
-import streamlit as st
 import logging
+import os
 from crewai.tools import BaseTool
+from trip_events import traced_tool
+from settings import require_secret
+from tools.cache import cache_from_env
+from tools.http_client import get_http_client
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
@@ -12,6 +15,18 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Serper search endpoint (point it at a compatible local service for testing)
+SERPER_URL = os.getenv("SERPER_URL", "https://google.serper.dev/search")
+
+# Shared result cache (configure with SEARCH_CACHE_TTL / _MAX_ENTRIES / _PATH)
+search_cache = cache_from_env("search", "SEARCH", default_ttl=6 * 3600)
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes a search query so trivially different spellings share a cache entry.
+    """
+    return " ".join(query.lower().split())
+
 class SearchQuery(BaseModel):
     # Defines the schema for the search query argument
     query: str = Field(..., description="The search query to look up")
@@ -21,24 +36,31 @@ class SearchTools(BaseTool):
     description: str = "Useful to search the internet about the given topic and return relevant results."
     args_schema: type[BaseModel] = SearchQuery
 
+    @traced_tool
     def _run(self, query: str) -> str:
         """
         Executes a search query using the Serper API and returns formatted results.
         """
         try:
             logger.info(f"Starting search for query: {query}")
+            cache_key = normalize_query(query)
+            cached = search_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Search cache hit for query: {query}")
+                return cached
+
             top_results_to_return = 4
-            url = "https://google.serper.dev/search"
+            url = SERPER_URL
             payload = json.dumps({"q": query})
             headers = {
-                'X-API-KEY': st.secrets["SERPER_API_KEY"],
+                'X-API-KEY': require_secret("SERPER_API_KEY"),
                 'Content-Type': 'application/json'
             }
 
             logger.debug(f"Payload: {payload}")
             logger.debug(f"Headers: {headers}")
 
-            response = requests.request("POST", url, headers=headers, data=payload)
+            response = get_http_client().post(url, headers=headers, data=payload)
             logger.info(f"Search API response status: {response.status_code}")
 
             if response.status_code != 200:
@@ -71,7 +93,9 @@ class SearchTools(BaseTool):
 
             if formatted_results:
                 logger.info(f"Returning {len(formatted_results)} formatted results.")
-                return "\n".join(formatted_results)
+                output = "\n".join(formatted_results)
+                search_cache.set(cache_key, output)
+                return output
             else:
                 logger.warning("No valid result found after formatting.")
                 return "No valid result found"
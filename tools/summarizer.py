@@ -0,0 +1,264 @@
+import hashlib
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from crewai import Task, Agent
+from trip_events import span, submit_with_context
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio used for budgeting (no tokenizer round-trip)
+CHARS_PER_TOKEN = 4
+
+# Sentence boundaries used to split elements that exceed a whole chunk
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the number of LLM tokens in `text`.
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def content_hash(text: str) -> str:
+    """
+    Returns a stable content-addressed key for a piece of text.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def split_oversized(text: str, max_tokens: int) -> list:
+    """
+    Splits a single element that does not fit in one chunk, preferring sentence
+    boundaries and falling back to hard character cuts for very long sentences.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    pieces, current = [], ""
+    for sentence in SENTENCE_BOUNDARY.split(text):
+        while len(sentence) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def pack_chunks(texts, max_tokens: int, separator: str = "\n\n") -> list:
+    """
+    Greedily packs consecutive texts (e.g. partitioned HTML elements) into chunks
+    of at most `max_tokens`, never splitting an element unless it is oversized.
+
+    Args:
+        texts (list): Texts in document order.
+        max_tokens (int): Token budget of a single chunk.
+        separator (str): String placed between texts inside a chunk.
+
+    Returns:
+        list: The packed chunks, in document order.
+    """
+    chunks, current, current_tokens = [], [], 0
+    separator_tokens = estimate_tokens(separator)
+    for text in texts:
+        if not text or not text.strip():
+            continue
+        tokens = estimate_tokens(text)
+        if tokens > max_tokens:
+            if current:
+                chunks.append(separator.join(current))
+                current, current_tokens = [], 0
+            chunks.extend(split_oversized(text, max_tokens))
+            continue
+        if current and current_tokens + separator_tokens + tokens > max_tokens:
+            chunks.append(separator.join(current))
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens + (separator_tokens if len(current) > 1 else 0)
+    if current:
+        chunks.append(separator.join(current))
+    return chunks
+
+
+class PageSummarizer():
+    """
+    Hierarchical map-reduce summarizer for scraped pages.
+
+    The map pass summarizes token-packed chunks in parallel; reduce passes then
+    merge the partial summaries (recursively if they still do not fit) until a
+    single summary within `summary_tokens` remains.
+    """
+    def __init__(self, llm_factory, chunk_tokens=2000, summary_tokens=800, concurrency=4, cache=None, max_depth=3, focus=None,
+                 max_chunks=None):
+        """
+        Args:
+            llm_factory (callable): Returns the LLM used by the summarization agents.
+                Only called once a chunk actually needs the LLM.
+            chunk_tokens (int): Token budget of a chunk sent to the LLM.
+            summary_tokens (int): Token budget of the final summary.
+            concurrency (int): Maximum number of LLM calls in flight.
+            cache (TTLCache): Optional cache of summaries keyed by content hash.
+            max_depth (int): Maximum number of reduce levels.
+            focus (str): Optional topic the summary should concentrate on.
+            max_chunks (int): Summarize only the first `max_chunks` chunks (e.g. when
+                the trip's token budget is running low); all chunks if None.
+        """
+        self.llm_factory = llm_factory
+        self.chunk_tokens = chunk_tokens
+        self.summary_tokens = summary_tokens
+        self.concurrency = concurrency
+        self.cache = cache
+        self.max_depth = max_depth
+        self.focus = focus
+        self.max_chunks = max_chunks
+        self._llm = None
+        self._llm_lock = threading.Lock()
+        self.llm_calls = 0
+        self.chunks = 0
+        self.trimmed = False
+
+    def summarize(self, texts) -> str:
+        """
+        Summarizes the given document texts into one bounded-size summary.
+
+        Args:
+            texts (list): Document texts (e.g. partitioned HTML elements) in order.
+
+        Returns:
+            str: The final summary, or an empty string if there was no content.
+        """
+        chunks = pack_chunks(texts, self.chunk_tokens)
+        if self.max_chunks and len(chunks) > self.max_chunks:
+            logger.info(f"Summarizing only the first {self.max_chunks} of {len(chunks)} chunks")
+            chunks = chunks[:self.max_chunks]
+            self.trimmed = True
+        self.chunks = len(chunks)
+        if not chunks:
+            return ""
+        logger.info(f"Summarizing {len(chunks)} chunks (budget {self.chunk_tokens} tokens each)")
+        summaries = self._run_all(chunks, "map")
+        return self._reduce(summaries, depth=1)
+
+    def _reduce(self, summaries, depth):
+        if len(summaries) == 1:
+            return self._bound(summaries[0])
+        if depth > self.max_depth:
+            logger.warning("Maximum reduce depth reached; truncating combined summaries")
+            return self._bound("\n\n".join(summaries))
+        groups = pack_chunks(summaries, self.chunk_tokens)
+        logger.info(f"Reduce level {depth}: merging {len(summaries)} summaries in {len(groups)} groups")
+        return self._reduce(self._run_all(groups, "reduce"), depth + 1)
+
+    def _run_all(self, texts, mode):
+        # Runs one LLM summarization per text concurrently, keeping the input order
+        results = [None] * len(texts)
+        pending = []
+        for idx, text in enumerate(texts):
+            cached = self.cache.get(self._cache_key(mode, text)) if self.cache else None
+            if cached is not None:
+                logger.info(f"Summary cache hit for {mode} chunk {idx+1}")
+                results[idx] = cached
+            else:
+                pending.append(idx)
+        if not pending:
+            return results
+
+        workers = min(self.concurrency, len(pending))
+        logger.info(f"Running {len(pending)}/{len(texts)} {mode} summaries with {workers} workers")
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="summarize") as executor:
+            futures = {
+                idx: submit_with_context(executor, self._summarize, texts[idx], idx, len(texts), mode)
+                for idx in pending
+            }
+            # A failed chunk only degrades its own slot
+            for idx, future in futures.items():
+                try:
+                    results[idx] = future.result()
+                except Exception as e:
+                    logger.error(f"Summarization failed for {mode} chunk {idx+1}: {e}")
+                    results[idx] = f"[Chunk {idx+1} could not be summarized: {e}]" if mode == "map" else texts[idx]
+        return results
+
+    def _summarize(self, text, idx, total, mode):
+        with span("summary", mode=mode, chunk=idx + 1, chunks=total, tokens=estimate_tokens(text)):
+            return self._summarize_chunk(text, idx, total, mode)
+
+    def _summarize_chunk(self, text, idx, total, mode):
+        logger.info(f"Processing {mode} chunk {idx+1}/{total}")
+        words = int(self.summary_tokens * 0.75)
+        focus = f"Concentrate on information about: {self.focus}. Skip unrelated content.\n" if self.focus else ""
+        agent = Agent(
+            role="Principal Researcher",
+            goal="Conduct in-depth research to gather accurate, relevant, and insightful information that supports strategic decision-making.",
+            backstory=(
+                "You are a highly analytical and detail-driven Principal Researcher with years of experience synthesizing complex information into actionable insights. "
+                "Known for your methodical approach and critical thinking, you specialize in uncovering valuable patterns, trends, and data-driven stories. "
+                "Your work enables teams to make informed choices across domains such as travel, business, technology, or policy. "
+                "You prioritize clarity, accuracy, and relevance in every report you produce."
+            ),
+            allow_delegation=False,
+            llm=self._get_llm()
+        )
+
+        if mode == "map":
+            description = (
+                "You are tasked with performing high-quality background research on the assigned topic. "
+                "This may include collecting data from reliable sources, summarizing key insights, comparing options, and identifying notable trends or considerations.\n\n"
+                f"**Topic**: {text}\n\n"
+                "Your goal is to:\n"
+                "- Analyze credible, up-to-date sources.\n"
+                "- Structure your findings clearly and concisely.\n"
+                "- Ensure all data supports the decision or planning process that follows.\n\n"
+                f"{focus}Keep the summary under {words} words. Present your output as a research summary with headings, bullet points, and clear structure."
+            )
+        else:
+            description = (
+                "You are given partial research summaries of consecutive sections of the same web page. "
+                "Merge them into one consolidated research summary, removing repetition while keeping every concrete fact "
+                "(names, prices, dates, addresses, opening hours).\n\n"
+                f"**Partial summaries**:\n{text}\n\n"
+                f"{focus}Keep the merged summary under {words} words, using headings and bullet points."
+            )
+
+        task = Task(
+            description=description,
+            expected_output="A concise, well-structured research summary.",
+            agent=agent
+        )
+
+        logger.info(f"Executing {mode} summarization task for chunk {idx+1}")
+        summary = task.execute_sync().raw
+        with self._llm_lock:
+            self.llm_calls += 1
+        if self.cache is not None:
+            self.cache.set(self._cache_key(mode, text), summary)
+        return summary
+
+    def _cache_key(self, mode, text):
+        # Focused summaries differ from generic ones for the same text
+        prefix = f"{mode}:{self.focus}" if self.focus else mode
+        return f"{prefix}:{content_hash(text)}"
+
+    def _get_llm(self):
+        with self._llm_lock:
+            if self._llm is None:
+                logger.info("Initializing LLM model")
+                self._llm = self.llm_factory()
+            return self._llm
+
+    def _bound(self, summary):
+        # Hard cap in case the model ignored the length instruction
+        max_chars = int(self.summary_tokens * CHARS_PER_TOKEN * 1.5)
+        if len(summary) <= max_chars:
+            return summary
+        return summary[:max_chars].rsplit(" ", 1)[0] + " ..."
@@ -1,10 +1,12 @@
 import logging
-from crewai import Agent, LLM
+from functools import lru_cache
+from crewai import Agent
 import re
-import streamlit as st
 from tools.browser_tools import BrowserTools
 from tools.calculator_tools import CalculatorTools
 from tools.search_tools import SearchTools
+from tools.llm import build_llm
+from trip_events import emit
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -19,16 +21,26 @@ class TripAgents():
     """
     Factory class for creating specialized travel-related AI agents.
     Each agent is initialized with specific tools and a unique backstory.
+
+    The LLM client and tools are built once per factory and shared by every
+    agent it creates; use get_trip_agents() to reuse one factory per process.
+    Agents themselves are cheap and created per request, so per-run state
+    (memory, task context, iteration counters) never leaks between requests.
     """
 
     def __init__(self):
         logging.info("Initializing TripAgents...")
-        self.llm = LLM(model="gemini/gemini-2.0-flash")
+        self.llm = build_llm()
         self.search_tool = SearchTools()
         self.browser_tool = BrowserTools()
         self.calculator_tool = CalculatorTools()
         logging.info("TripAgents initialized with LLM and tools.")
 
+    @staticmethod
+    def _record_step(step):
+        # One event per agent reasoning step (thought, tool call or final answer)
+        emit("agent_step", step=type(step).__name__)
+
     def city_selection_agent(self):
         """
         Creates an agent specialized in selecting the best city for travel
@@ -48,6 +60,7 @@ class TripAgents():
             tools=[self.search_tool, self.browser_tool],
             allow_delegation=False,
             llm=self.llm,
+            step_callback=self._record_step,
             verbose=True
         )
         logging.info("City Selection Expert agent created.")
@@ -71,6 +84,7 @@ class TripAgents():
             tools=[self.search_tool, self.browser_tool],
             allow_delegation=False,
             llm=self.llm,
+            step_callback=self._record_step,
             verbose=True
         )
         logging.info("Local Expert agent created.")
@@ -94,7 +108,16 @@ class TripAgents():
             tools=[self.search_tool, self.browser_tool, self.calculator_tool],
             allow_delegation=False,
             llm=self.llm,
+            step_callback=self._record_step,
             verbose=True
         )
         logging.info("Travel Concierge agent created.")
-        return agent
\ No newline at end of file
+        return agent
+
+
+@lru_cache()
+def get_trip_agents():
+    """
+    Returns the process-wide TripAgents factory, building the LLM client and tools on first use.
+    """
+    return TripAgents()
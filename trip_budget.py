@@ -0,0 +1,216 @@
+import contextvars
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from trip_events import emit
+
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Token budget of the planning run executing in the current context
+_current_budget = contextvars.ContextVar("trip_budget", default=None)
+
+# Estimated LLM tokens per trip after which planning degrades (fewer page chunks, skipped scrapes); 0 disables
+SOFT_TOKEN_BUDGET = int(os.getenv("TRIP_SOFT_TOKEN_BUDGET", "300000"))
+# Estimated LLM tokens per trip after which no more LLM calls are made and a partial plan is returned; 0 disables
+HARD_TOKEN_BUDGET = int(os.getenv("TRIP_HARD_TOKEN_BUDGET", "500000"))
+
+# USD per million prompt / completion tokens, for cost reporting (defaults: Gemini 2.0 Flash)
+PROMPT_PRICE_PER_MILLION = float(os.getenv("LLM_PROMPT_PRICE_PER_MILLION", "0.10"))
+COMPLETION_PRICE_PER_MILLION = float(os.getenv("LLM_COMPLETION_PRICE_PER_MILLION", "0.40"))
+
+# Budget states
+OK = "ok"
+DEGRADED = "degraded"
+EXCEEDED = "exceeded"
+
+
+class BudgetExceeded(RuntimeError):
+    """
+    Raised instead of making an LLM call once a trip's hard token budget is spent.
+    """
+    def __init__(self, message, partial=None):
+        """
+        Args:
+            message (str): What ran out.
+            partial (str): Output the failing stage had finished before the budget ran out, if any.
+        """
+        super().__init__(message)
+        self.partial = partial
+
+
+class TokenBudget():
+    """
+    Accounts the LLM tokens and cost of one planning request, across the crew
+    agents and the page summarization agents inside BrowserTools.
+
+    Past the soft budget the run is `degraded`: pages are summarized from
+    fewer chunks, and scrapes that would not fit in what is left of the hard
+    budget are skipped. Past the hard budget check() raises BudgetExceeded, so
+    no further LLM call is made and the planner returns a partial plan.
+    Tokens are estimated from text length, like the metrics.
+    """
+    def __init__(self, soft_tokens=SOFT_TOKEN_BUDGET, hard_tokens=HARD_TOKEN_BUDGET,
+                 prompt_price=PROMPT_PRICE_PER_MILLION, completion_price=COMPLETION_PRICE_PER_MILLION):
+        """
+        Args:
+            soft_tokens (int): Tokens after which the run degrades (0 disables).
+            hard_tokens (int): Tokens after which LLM calls are refused (0 disables).
+            prompt_price (float): USD per million prompt tokens.
+            completion_price (float): USD per million completion tokens.
+        """
+        self.soft_tokens = soft_tokens
+        self.hard_tokens = hard_tokens
+        self.prompt_price = prompt_price
+        self.completion_price = completion_price
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.llm_calls = 0
+        self.refused_calls = 0
+        self.skipped_scrapes = 0
+        self.trimmed_pages = 0
+        # Set by the planner when it returned a partial plan
+        self.partial = False
+        self._lock = threading.Lock()
+
+    @property
+    def total_tokens(self):
+        return self.prompt_tokens + self.completion_tokens
+
+    @property
+    def cost(self):
+        return (self.prompt_tokens * self.prompt_price + self.completion_tokens * self.completion_price) / 1_000_000
+
+    @property
+    def degraded(self):
+        return (bool(self.soft_tokens) and self.total_tokens >= self.soft_tokens) or self.exceeded
+
+    @property
+    def exceeded(self):
+        return bool(self.hard_tokens) and self.total_tokens >= self.hard_tokens
+
+    @property
+    def remaining(self):
+        """
+        Tokens left before the hard budget, or None without a hard budget.
+        """
+        return max(0, self.hard_tokens - self.total_tokens) if self.hard_tokens else None
+
+    @property
+    def status(self):
+        return EXCEEDED if self.exceeded else DEGRADED if self.degraded else OK
+
+    def check(self):
+        """
+        Raises BudgetExceeded if the hard budget is spent; called before every LLM call.
+        """
+        if self.exceeded:
+            with self._lock:
+                self.refused_calls += 1
+            raise BudgetExceeded(f"Token budget of {self.hard_tokens} tokens exceeded ({self.total_tokens} used)")
+
+    def charge(self, prompt_tokens, completion_tokens):
+        """
+        Adds one LLM call to the usage, emitting `budget_degraded` / `budget_exceeded`
+        when it crosses the soft or hard budget.
+        """
+        with self._lock:
+            before = self.status
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.llm_calls += 1
+            after = self.status
+        if after != before:
+            logger.warning("Trip token budget %s after %s tokens", after, self.total_tokens)
+            emit(f"budget_{after}", **self.usage())
+
+    def absorb(self, other, share=1.0):
+        """
+        Adds a share of another budget's usage, e.g. of a stage run once for
+        several trips of a batch.
+
+        Args:
+            other (TokenBudget): Budget the shared work was charged to.
+            share (float): Fraction of its usage to add.
+        """
+        with self._lock:
+            self.prompt_tokens += round(other.prompt_tokens * share)
+            self.completion_tokens += round(other.completion_tokens * share)
+            self.llm_calls += round(other.llm_calls * share)
+            self.skipped_scrapes += round(other.skipped_scrapes * share)
+            self.trimmed_pages += round(other.trimmed_pages * share)
+
+    def note(self, counter):
+        """
+        Counts a degradation, e.g. "skipped_scrapes" or "trimmed_pages".
+        """
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def usage(self):
+        """
+        Returns the token usage, estimated cost and budget state of the run.
+        """
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+            "llm_calls": self.llm_calls,
+            "cost_usd": round(self.cost, 6),
+            "budget_status": self.status,
+            "partial": self.partial,
+            "soft_budget_tokens": self.soft_tokens or None,
+            "hard_budget_tokens": self.hard_tokens or None,
+            "refused_llm_calls": self.refused_calls,
+            "skipped_scrapes": self.skipped_scrapes,
+            "trimmed_pages": self.trimmed_pages
+        }
+
+
+def current_budget():
+    """
+    Returns the TokenBudget of the run executing in the current context, or None.
+    """
+    return _current_budget.get()
+
+
+def budget_degraded():
+    """
+    True when the current run is past its soft budget; its stage outputs are
+    then not cached for other requests.
+    """
+    budget = _current_budget.get()
+    return budget is not None and budget.degraded
+
+
+def budget_exceeded():
+    """
+    True when the current run has spent its hard budget.
+    """
+    budget = _current_budget.get()
+    return budget is not None and budget.exceeded
+
+
+@contextmanager
+def metered(budget=None):
+    """
+    Charges every LLM call made in the current context (and the tools and
+    worker threads it starts) to a TokenBudget.
+
+    Args:
+        budget (TokenBudget): Budget to charge; one with the configured limits is created if omitted.
+
+    Yields:
+        TokenBudget: The budget.
+    """
+    budget = budget or TokenBudget()
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
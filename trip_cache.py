@@ -0,0 +1,300 @@
+import contextvars
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from tools.cache import cache_from_env
+from trip_events import emit
+from trip_budget import BudgetExceeded, budget_degraded
+
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Set while a run must not reuse saved stage outputs or destination research
+_fresh_run = contextvars.ContextVar("trip_fresh_run", default=False)
+
+
+@contextmanager
+def fresh_run():
+    """
+    Makes the stages run in the current context (and the worker threads it
+    starts) skip stage checkpoints and destination knowledge, so a traced run
+    does every stage itself. What the run produces is still saved.
+    """
+    token = _fresh_run.set(True)
+    try:
+        yield
+    finally:
+        _fresh_run.reset(token)
+
+
+def normalize_field(value) -> str:
+    """
+    Normalizes a request field so cosmetic differences (case, spacing) share a fingerprint.
+    """
+    return " ".join(str(value).lower().split())
+
+
+def trip_fingerprint(origin, cities, date_range, interests) -> str:
+    """
+    Returns a stable fingerprint of a trip request.
+
+    Args:
+        origin (str): The traveler's origin city.
+        cities (str): Destination city or candidate cities.
+        date_range (str): Travel date range, e.g. "2025-06-10 to 2025-06-15".
+        interests (str): Traveler's interests.
+
+    Returns:
+        str: Hex digest identifying the request.
+    """
+    fields = {
+        "origin": normalize_field(origin),
+        "cities": normalize_field(cities),
+        "date_range": normalize_field(date_range),
+        "interests": normalize_field(interests)
+    }
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def travel_month(date_range) -> str:
+    """
+    Returns the "YYYY-MM" month a "YYYY-MM-DD to YYYY-MM-DD" trip starts in.
+    """
+    return str(date_range).strip()[:7]
+
+
+def stage_fingerprint(stage, inputs, upstream=None) -> str:
+    """
+    Returns a fingerprint of a stage run that covers only what the stage depends on.
+
+    Args:
+        stage (str): Pipeline stage name.
+        inputs (dict): The request fields the stage depends on.
+        upstream (str): Report of the earlier stage it builds on, if any.
+
+    Returns:
+        str: Hex digest; equal digests mean the stage output can be reused.
+    """
+    fields = {name: normalize_field(value) for name, value in inputs.items()}
+    fields["stage"] = stage
+    if upstream is not None:
+        fields["upstream"] = hashlib.sha256(upstream.encode("utf-8")).hexdigest()
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class SingleFlight():
+    """
+    Coalesces concurrent calls with the same key onto a single execution.
+
+    The first caller runs the function; callers arriving while it is running
+    wait for and share its result (or its exception).
+    """
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """
+        Runs `fn()` once per key at a time.
+
+        Returns:
+            tuple: (result, shared) where `shared` is True if another caller ran `fn`.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not leader:
+            logger.info("Joining in-flight run for %s", key[:12])
+            return future.result(), True
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class TripResultCache():
+    """
+    Caches finished itineraries by request fingerprint and de-duplicates
+    identical requests that are planned at the same time.
+    """
+    def __init__(self, cache):
+        """
+        Args:
+            cache (TTLCache): Storage for itineraries (in-memory, optionally backed by SQLite).
+        """
+        self.cache = cache
+        self.single_flight = SingleFlight()
+
+    def get_or_run(self, fingerprint, fn):
+        """
+        Returns the cached itinerary for `fingerprint`, or runs `fn()` to produce it.
+        Only non-empty results are cached, so failed runs are retried next time;
+        neither are itineraries planned past the run's soft token budget.
+
+        Callers that joined an identical in-flight run share its result only
+        when that result is cacheable. A degraded or partial plan reflects the
+        leader's budget rather than the request, so they then plan the trip
+        themselves, under their own budget.
+        """
+        cached = self.cache.get(fingerprint)
+        if cached is not None:
+            logger.info("Itinerary cache hit for %s", fingerprint[:12])
+            emit("trip_cache_hit", fingerprint=fingerprint)
+            return cached
+
+        def run():
+            # Re-check: the previous leader may have finished just before we got here
+            cached = self.cache.get(fingerprint)
+            if cached is not None:
+                return cached, True
+            try:
+                result = fn()
+            except BudgetExceeded as e:
+                # Only the leader's budget ran out; joined callers plan on their own budget
+                return e, False
+            cacheable = bool(result) and not budget_degraded()
+            if cacheable:
+                self.cache.set(fingerprint, result)
+            return result, cacheable
+
+        (result, cacheable), shared = self.single_flight.do(fingerprint, run)
+        if not shared:
+            if isinstance(result, BudgetExceeded):
+                raise result
+            return result
+        if not cacheable:
+            logger.info("Shared run for %s was not cacheable, planning it again", fingerprint[:12])
+            return fn()
+        emit("trip_coalesced", fingerprint=fingerprint)
+        return result
+
+
+# Process-wide itinerary cache (configure with TRIP_CACHE_TTL / _MAX_ENTRIES / _PATH)
+trip_result_cache = TripResultCache(cache_from_env("trips", "TRIP", default_ttl=3600, default_max_entries=256))
+
+
+class StageCheckpoints():
+    """
+    Persists the output of finished pipeline stages so a failed run can be
+    resumed at its first incomplete stage instead of starting over, and so
+    a revised request can reuse the stages its changes do not affect.
+    """
+    def __init__(self, cache):
+        """
+        Args:
+            cache (TTLCache): Storage for stage outputs (SQLite-backed by default).
+        """
+        self.cache = cache
+
+    @staticmethod
+    def key(fingerprint, stage):
+        return f"{fingerprint}:{stage}"
+
+    def get(self, fingerprint, stage):
+        """
+        Returns the saved output of `stage` for the fingerprint, or None.
+        """
+        return self.cache.get(self.key(fingerprint, stage))
+
+    def save(self, fingerprint, stage, output):
+        """
+        Saves the output of a finished stage. Empty outputs are not saved, and
+        neither are outputs of a run past its soft token budget, whose research
+        may have been trimmed.
+        """
+        if output and not budget_degraded():
+            self.cache.set(self.key(fingerprint, stage), output)
+
+    def run(self, fingerprint, stage, fn):
+        """
+        Returns the checkpointed output of `stage`, or runs `fn()` and checkpoints its output.
+        Inside fresh_run() the checkpoint is not read.
+        """
+        output = None if _fresh_run.get() else self.get(fingerprint, stage)
+        if output is not None:
+            logger.info("Resuming %s from checkpoint for %s", stage, fingerprint[:12])
+            emit("stage_resumed", stage=stage, fingerprint=fingerprint)
+            return output
+        output = fn()
+        self.save(fingerprint, stage, output)
+        return output
+
+
+# Process-wide stage checkpoints (configure with CHECKPOINT_CACHE_TTL / _MAX_ENTRIES / _PATH)
+stage_checkpoints = StageCheckpoints(cache_from_env(
+    "checkpoints", "CHECKPOINT", default_ttl=86400, default_max_entries=256, default_path="trip_checkpoints.db"
+))
+
+
+class DestinationKnowledge():
+    """
+    Shares traveler-independent destination research (neighborhoods,
+    etiquette, food, events, safety) between all trips to the same city in
+    the same month.
+    """
+    def __init__(self, cache):
+        """
+        Args:
+            cache (TTLCache): Storage for destination reports.
+        """
+        self.cache = cache
+        self.single_flight = SingleFlight()
+
+    @staticmethod
+    def key(city, month):
+        return f"{normalize_field(city)}|{month}"
+
+    def get_or_run(self, city, month, fn):
+        """
+        Returns the stored report for (city, month), or runs `fn()` to research it.
+        Concurrent trips to the same destination share one research run. Reports
+        researched past the run's soft token budget are not stored. Inside
+        fresh_run() the destination is always researched again.
+        """
+        key = self.key(city, month)
+        if _fresh_run.get():
+            report = fn()
+            if report and not budget_degraded():
+                self.cache.set(key, report)
+            return report
+        report = self.cache.get(key)
+        if report is not None:
+            logger.info("Destination knowledge hit for %s", key)
+            emit("destination_cache_hit", city=city, month=month)
+            return report
+
+        def run():
+            report = self.cache.get(key)
+            if report is not None:
+                return report
+            report = fn()
+            if report and not budget_degraded():
+                self.cache.set(key, report)
+            return report
+
+        report, _ = self.single_flight.do(key, run)
+        return report
+
+
+# Process-wide destination knowledge (configure with DESTINATION_CACHE_TTL / _MAX_ENTRIES / _PATH)
+destination_knowledge = DestinationKnowledge(cache_from_env(
+    "destinations", "DESTINATION", default_ttl=7 * 86400, default_max_entries=512
+))
@@ -0,0 +1,165 @@
+import contextvars
+import functools
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Event bus of the planning run executing in the current context
+_current_bus = contextvars.ContextVar("trip_event_bus", default=None)
+
+# Fields added to every event emitted in the current context (e.g. the running stage)
+_current_tags = contextvars.ContextVar("trip_event_tags", default={})
+
+# Process-wide observers of every event (e.g. metrics), whether or not a run is bound
+_listeners = []
+
+
+class EventBus():
+    """
+    Collects the progress events of a single planning run.
+
+    Events are kept in order so that any number of subscribers (e.g. SSE streams)
+    can replay them from the beginning and then follow new ones as they arrive.
+    """
+    def __init__(self, run_id):
+        self.run_id = run_id
+        self.events = []
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def emit(self, event_type, **data):
+        """
+        Appends an event to the bus. Events emitted after close() are dropped.
+        """
+        event = {"type": event_type, "run_id": self.run_id, "timestamp": time.time(), **data}
+        with self._lock:
+            if not self.closed:
+                self.events.append(event)
+        return event
+
+    def close(self):
+        """
+        Marks the run as finished; subscribers stop after the remaining events.
+        """
+        with self._lock:
+            self.closed = True
+
+    def read(self, index):
+        """
+        Returns the events after `index` together with the closed flag.
+        """
+        with self._lock:
+            return self.events[index:], self.closed
+
+
+@contextmanager
+def bind(bus):
+    """
+    Routes events emitted in the current context (and the tools it calls) to `bus`.
+    """
+    token = _current_bus.set(bus)
+    try:
+        yield bus
+    finally:
+        _current_bus.reset(token)
+
+
+def current_bus():
+    return _current_bus.get()
+
+
+@contextmanager
+def tagged(**tags):
+    """
+    Adds `tags` to every event emitted in the current context (and the
+    tools, LLM calls and worker threads it starts).
+    """
+    token = _current_tags.set({**_current_tags.get(), **tags})
+    try:
+        yield
+    finally:
+        _current_tags.reset(token)
+
+
+def add_listener(listener):
+    """
+    Registers `listener(event)` to observe every event emitted in the process.
+    """
+    _listeners.append(listener)
+
+
+def emit(event_type, **data):
+    """
+    Emits an event on the current run's bus and to the process-wide listeners.
+    Outside a bound run only the listeners see it.
+    """
+    tags = _current_tags.get()
+    if tags:
+        data = {**tags, **data}
+    bus = _current_bus.get()
+    if bus is not None:
+        event = bus.emit(event_type, **data)
+    else:
+        event = {"type": event_type, "run_id": None, "timestamp": time.time(), **data}
+    for listener in _listeners:
+        try:
+            listener(event)
+        except Exception:
+            logger.exception("Event listener failed for %s", event_type)
+
+
+@contextmanager
+def span(kind, **data):
+    """
+    Emits `<kind>_started` and `<kind>_finished` events around a block,
+    recording its duration and whether it raised.
+    """
+    emit(f"{kind}_started", **data)
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except Exception:
+        status = "error"
+        raise
+    finally:
+        emit(f"{kind}_finished", duration=round(time.perf_counter() - start, 3), status=status, **data)
+
+
+def submit_with_context(executor, fn, *args, **kwargs):
+    """
+    Submits `fn` to `executor` inside a copy of the caller's context,
+    so events emitted on worker threads reach the current run's bus.
+    """
+    ctx = contextvars.copy_context()
+    return executor.submit(ctx.run, fn, *args, **kwargs)
+
+
+def traced_tool(fn):
+    """
+    Decorator for a tool's `_run` method that wraps each call in a `tool` span.
+    """
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        with span("tool", tool=self.name, args=_preview(kwargs or args)):
+            return fn(self, *args, **kwargs)
+    return wrapper
+
+
+def format_sse(event):
+    """
+    Serializes an event as a server-sent-event frame.
+    """
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+def _preview(value, limit=200):
+    # Keep tool arguments short enough to be useful in progress events
+    text = str(value)
+    return text if len(text) <= limit else text[:limit] + "..."
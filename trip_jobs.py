@@ -0,0 +1,274 @@
+import logging
+import math
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from trip_events import EventBus, bind, emit
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Job lifecycle states
+PENDING = "PENDING"
+RUNNING = "RUNNING"
+SUCCESS = "SUCCESS"
+ERROR = "ERROR"
+
+# Assumed job duration until the first job has finished, for Retry-After estimates (seconds)
+DEFAULT_JOB_SECONDS = 120
+
+
+class Rejected(RuntimeError):
+    """
+    Raised when a job is not admitted; the caller should retry after `retry_after` seconds.
+    """
+    reason = "rejected"
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+class QueueFull(Rejected):
+    """
+    Raised when every worker is busy and the queue is at its maximum depth.
+    """
+    reason = "queue_full"
+
+
+class RateLimited(Rejected):
+    """
+    Raised when a client submits jobs faster than its rate limit.
+    """
+    reason = "rate_limited"
+
+
+class RateLimiter():
+    """
+    Per-client token bucket: each client may submit `per_minute` jobs per
+    minute on average, with bursts of up to `burst` jobs.
+    """
+    def __init__(self, per_minute, burst=None):
+        """
+        Args:
+            per_minute (float): Sustained submissions per minute per client.
+            burst (int): Submissions a client may make at once (defaults to `per_minute`).
+        """
+        self.rate = per_minute / 60
+        self.burst = burst or max(1, int(per_minute))
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, client):
+        """
+        Takes one submission from the client's bucket.
+
+        Raises:
+            RateLimited: If the client's bucket is empty.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            limited = tokens < 1
+            self._buckets[client] = (tokens if limited else tokens - 1, now)
+            # Forget clients whose bucket has refilled, so the table stays small
+            if len(self._buckets) > 10000:
+                self._buckets = {
+                    key: (t, u) for key, (t, u) in self._buckets.items()
+                    if t + (now - u) * self.rate < self.burst
+                }
+        if limited:
+            logger.warning("Rate limited client %s", client)
+            emit("job_rejected", reason=RateLimited.reason, client=client)
+            raise RateLimited(f"Rate limit exceeded for {client}", (1 - tokens) / self.rate)
+
+
+class TripJob():
+    """
+    Holds the state of a single trip planning job submitted to the JobManager.
+    """
+    def __init__(self, payload=None):
+        self.id = uuid.uuid4().hex
+        self.payload = payload
+        self.status = PENDING
+        self.result = None
+        self.error = None
+        # HTTP status of the error, when the job raised an HTTP error (e.g. FastAPI's HTTPException)
+        self.error_status = None
+        self.created_at = datetime.now()
+        self.submitted = time.perf_counter()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        # Progress events emitted while the job runs
+        self.events = EventBus(self.id)
+        # Timeline recorder, when the job was submitted with tracing
+        self.trace = None
+        # Token budget the job's LLM calls are charged to
+        self.budget = None
+        # Planner slots the job takes in the JobManager
+        self.slots = 1
+
+    @property
+    def done(self):
+        return self.status in (SUCCESS, ERROR)
+
+
+class JobManager():
+    """
+    Runs trip planning jobs on a bounded thread pool so that long crew runs
+    never block the caller (e.g. the FastAPI event loop).
+
+    Capacity is counted in planner slots: a single trip takes one, a job
+    that plans several trips in parallel (a batch) takes one per concurrent
+    trip. At most `max_workers` slots are running at a time and at most
+    `max_queue` wait; further submissions are rejected with QueueFull instead
+    of queueing without bound, so a burst cannot slow every request down.
+    """
+    def __init__(self, max_workers=4, retention_seconds=3600, max_queue=None):
+        """
+        Args:
+            max_workers (int): Maximum number of planner slots (crews) running at the same time.
+            retention_seconds (int): How long finished jobs are kept for polling.
+            max_queue (int): Maximum number of slots waiting for a worker (None for no limit).
+        """
+        self.max_workers = max_workers
+        self.retention_seconds = retention_seconds
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="trip-crew")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        # Signalled when running slots are released
+        self._released = threading.Condition(self._lock)
+        self._queued = 0
+        self._running = 0
+        # Moving average of job durations, for Retry-After estimates
+        self._average_seconds = None
+        logger.info("JobManager started with %s workers (queue depth %s)", max_workers, max_queue)
+
+    def submit(self, fn, *args, payload=None, slots=1, **kwargs):
+        """
+        Queues `fn(*args, **kwargs)` on the worker pool and returns its TripJob immediately.
+
+        Args:
+            fn (callable): The function that performs the planning run.
+            payload: Optional request object kept on the job for reference.
+            slots (int): Crews the job runs concurrently (capped at `max_workers`).
+
+        Returns:
+            TripJob: The newly created job.
+
+        Raises:
+            QueueFull: If every worker is busy and the queue is full.
+        """
+        self._prune()
+        job = TripJob(payload=payload)
+        job.slots = max(1, min(slots, self.max_workers))
+        with self._lock:
+            queued, running = self._queued, self._running
+            full = self.max_queue is not None and queued + running + job.slots > self.max_workers + self.max_queue
+            if full:
+                retry_after = self._retry_after()
+            else:
+                self._queued += job.slots
+                self._jobs[job.id] = job
+        if full:
+            logger.warning("Rejected job: %s running, %s queued", running, queued)
+            emit("job_rejected", reason=QueueFull.reason, queued=queued, running=running)
+            raise QueueFull(f"Planning queue is full ({queued} waiting)", retry_after)
+        job.future = self._executor.submit(self._run, job, fn, args, kwargs)
+        logger.info("Queued job %s", job.id)
+        return job
+
+    def stats(self):
+        """
+        Returns the running and queued planner slots and the configured limits.
+        """
+        with self._lock:
+            return {
+                "running": self._running,
+                "queued": self._queued,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue
+            }
+
+    def _retry_after(self):
+        # Time until a queue slot frees up if jobs keep taking their average duration (caller holds the lock)
+        average = self._average_seconds or DEFAULT_JOB_SECONDS
+        return average * (self._queued + 1) / self.max_workers
+
+    def get(self, job_id):
+        """
+        Returns the TripJob with the given id, or None if it is unknown or expired.
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self, wait=False):
+        """
+        Stops accepting new jobs and releases the worker pool.
+        """
+        logger.info("Shutting down JobManager")
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, job, fn, args, kwargs):
+        with self._lock:
+            # A multi-slot job waits until enough slots are free
+            while self._running + job.slots > self.max_workers:
+                self._released.wait()
+            self._queued -= job.slots
+            self._running += job.slots
+        job.status = RUNNING
+        job.started_at = datetime.now()
+        start = time.perf_counter()
+        queue_wait = start - job.submitted
+        logger.info("Job %s started after %.1fs in the queue", job.id, queue_wait)
+        with bind(job.events):
+            emit("job_started", queue_wait=round(queue_wait, 3))
+            status = ERROR
+            try:
+                job.result = fn(*args, **kwargs)
+                status = SUCCESS
+                logger.info("Job %s finished in %.1fs", job.id, time.perf_counter() - start)
+            except Exception as e:
+                # HTTP errors carry their message in `detail`; str() would prefix the status code
+                job.error = str(getattr(e, "detail", None) or e)
+                job.error_status = getattr(e, "status_code", None)
+                logger.error("Job %s failed after %.1fs: %s", job.id, time.perf_counter() - start, job.error)
+            finally:
+                # A job is done once its status is final; finished_at is set first so _prune can rely on it
+                with self._lock:
+                    job.finished_at = datetime.now()
+                    job.status = status
+                emit(
+                    "job_finished",
+                    status=job.status,
+                    duration=round(time.perf_counter() - start, 3),
+                    itinerary=job.result,
+                    error=job.error
+                )
+                job.events.close()
+                duration = time.perf_counter() - start
+                with self._lock:
+                    self._running -= job.slots
+                    self._released.notify_all()
+                    self._average_seconds = duration if self._average_seconds is None else 0.8 * self._average_seconds + 0.2 * duration
+        return job
+
+    def _prune(self):
+        # Drop finished jobs that are older than the retention window
+        now = datetime.now()
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.done and job.finished_at is not None
+                and (now - job.finished_at).total_seconds() > self.retention_seconds
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+        if expired:
+            logger.info("Pruned %s expired jobs", len(expired))
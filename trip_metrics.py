@@ -0,0 +1,216 @@
+import logging
+import re
+import threading
+from trip_events import add_listener
+from tools.cache import registered_caches
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Histogram buckets for latencies (seconds) and for small counts
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+COUNT_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+# Metric name prefix per tool, e.g. search_tool_latency_seconds
+TOOL_KINDS = {
+    "Search the Internet": "search",
+    "Scrape the website content": "browser",
+    "Make a calculation": "calculator"
+}
+
+# Events that are simply counted
+EVENT_COUNTERS = {
+    "trip_cache_hit": ("trip_cache_hits_total", "Itineraries served from the itinerary cache"),
+    "trip_coalesced": ("trip_coalesced_total", "Requests joined to an identical in-flight run"),
+    "destination_cache_hit": ("destination_cache_hits_total", "Gather stages that reused destination knowledge"),
+    "budget_degraded": ("trip_budget_degraded_total", "Runs that passed their soft token budget"),
+    "budget_exceeded": ("trip_budget_exceeded_total", "Runs that spent their hard token budget")
+}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter():
+    """
+    Monotonic counter with optional labels.
+    """
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in sorted(self._values.items())]
+
+
+class Histogram():
+    """
+    Cumulative-bucket histogram with optional labels.
+    """
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            counts, total, count = self._values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            counts = [c + (1 if value <= bound else 0) for c, bound in zip(counts, self.buckets)]
+            self._values[key] = (counts, total + value, count + 1)
+
+    def samples(self):
+        lines = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                for bound, c in zip(self.buckets, counts):
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [le])} {c}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [le])} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {round(total, 6)}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+class MetricsRegistry():
+    """
+    Turns progress events into Prometheus-style counters and histograms.
+
+    Registered as a process-wide event listener, so it sees every task, tool,
+    HTTP and LLM event of every run, and renders them in the Prometheus text
+    exposition format for the API's /metrics endpoint.
+    """
+    def __init__(self):
+        self._metrics = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+        self._installed = False
+
+    def counter(self, name, help_text, labels=()):
+        return self._get(Counter, name, help_text, labels)
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, help_text, labels, buckets=buckets)
+
+    def gauge(self, name, help_text, fn):
+        """
+        Registers a gauge whose value is read from `fn()` at render time (e.g. the job queue depth).
+        """
+        with self._lock:
+            self._gauges[name] = (help_text, fn)
+
+    def _get(self, cls, name, help_text, labels, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labels, **kwargs)
+            return metric
+
+    def install(self):
+        """
+        Starts observing events; safe to call more than once.
+        """
+        if not self._installed:
+            self._installed = True
+            add_listener(self.record)
+            logger.info("Metrics listener installed")
+
+    def record(self, event):
+        """
+        Updates the metrics for one progress event.
+        """
+        kind = event["type"]
+        stage = event.get("stage", "")
+        if kind == "job_started":
+            self.histogram("trip_queue_wait_seconds", "Time planning jobs waited for a worker").observe(event.get("queue_wait", 0))
+        elif kind == "job_rejected":
+            self.counter("trip_rejected_total", "Planning requests rejected by admission control", ["reason"]).inc(reason=event["reason"])
+        elif kind == "job_finished":
+            self.counter("trip_requests_total", "Planning jobs by final status", ["status"]).inc(status=event["status"])
+            self.histogram("trip_duration_seconds", "End-to-end planning job latency").observe(event["duration"])
+        elif kind == "task_finished":
+            self.histogram("stage_duration_seconds", "Pipeline stage latency", ["stage"]).observe(event["duration"], stage=stage)
+        elif kind == "tool_finished":
+            tool = TOOL_KINDS.get(event.get("tool"), re.sub(r"\W+", "_", str(event.get("tool", "tool")).lower()))
+            self.histogram(f"{tool}_tool_latency_seconds", f"Latency of the {tool} tool", ["stage", "status"]).observe(
+                event["duration"], stage=stage, status=event["status"]
+            )
+        elif kind == "llm_call":
+            labels = {"stage": stage, "model": event["model"]}
+            self.counter("llm_calls_total", "LLM completions", ["stage", "model", "status"]).inc(status=event["status"], **labels)
+            self.histogram("llm_latency_seconds", "LLM completion latency", ["stage", "model"]).observe(event["duration"], **labels)
+            self.histogram("llm_slot_wait_seconds", "Time LLM calls waited for an LLM_CONCURRENCY slot").observe(event.get("slot_wait", 0))
+            tokens = self.counter("llm_tokens_total", "Estimated LLM tokens", ["stage", "model", "type"])
+            tokens.inc(event["prompt_tokens"], type="prompt", **labels)
+            tokens.inc(event["completion_tokens"], type="completion", **labels)
+        elif kind == "http_request":
+            self.histogram("http_request_duration_seconds", "Upstream HTTP attempt latency", ["host", "status"]).observe(
+                event["duration"], host=event["host"], status=event["status"]
+            )
+        elif kind == "page_summarized":
+            self.histogram("browser_chunks_per_page", "Chunks summarized per scraped page", buckets=COUNT_BUCKETS).observe(event["chunks"])
+            self.counter("browser_summary_llm_calls_total", "LLM calls made to summarize pages").inc(event["llm_calls"])
+        elif kind == "agent_step":
+            self.counter("agent_steps_total", "Agent reasoning steps", ["stage"]).inc(stage=stage)
+        elif kind == "stage_resumed":
+            self.counter("stage_checkpoint_hits_total", "Stages served from checkpoints", ["stage"]).inc(stage=stage)
+        elif kind in EVENT_COUNTERS:
+            self.counter(*EVENT_COUNTERS[kind]).inc()
+
+    def render(self):
+        """
+        Returns all metrics, plus the hit ratios of the process' caches, in the Prometheus text format.
+        """
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+            gauges = sorted(self._gauges.items())
+        for metric in metrics:
+            lines += [f"# HELP {metric.name} {metric.help}", f"# TYPE {metric.name} {metric.kind}", *metric.samples()]
+        for name, (help_text, fn) in gauges:
+            try:
+                value = fn()
+            except Exception:
+                logger.exception("Gauge %s failed", name)
+                continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+
+        stats = [cache.stats() for cache in registered_caches()]
+        for name, field, kind, help_text in (
+            ("cache_hits_total", "hits", "counter", "Cache lookups served from memory or disk"),
+            ("cache_disk_hits_total", "disk_hits", "counter", "Cache lookups served from the SQLite tier"),
+            ("cache_misses_total", "misses", "counter", "Cache lookups that missed"),
+            ("cache_hit_ratio", "hit_ratio", "gauge", "Share of cache lookups that hit"),
+            ("cache_entries", "size", "gauge", "Entries held in memory")
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            lines += [f'{name}{{cache="{_escape(s["name"])}"}} {s[field]}' for s in stats]
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide metrics; call metrics.install() to start collecting
+metrics = MetricsRegistry()
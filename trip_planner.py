@@ -0,0 +1,676 @@
+import logging
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from crewai import Crew
+from trip_agents import get_trip_agents
+from trip_tasks import TripTasks
+from trip_events import emit, submit_with_context, tagged
+from trip_budget import BudgetExceeded, TokenBudget, budget_exceeded, current_budget, metered
+from trip_cache import (
+    normalize_field, stage_fingerprint, travel_month, trip_fingerprint, trip_result_cache, stage_checkpoints,
+    destination_knowledge
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Pipeline stages in execution order
+STAGES = ("identify", "gather", "plan")
+
+# Separators between candidate cities in the destination field. Commas are not
+# separators since they usually qualify a city ("Tokyo, Japan").
+CANDIDATE_SEPARATOR = re.compile(r"\s*(?:[;|/\n]|\bor\b|\bvs\.?(?=\s))\s*", re.IGNORECASE)
+
+# Maximum number of candidate cities scored concurrently
+CITY_SCORE_CONCURRENCY = int(os.getenv("CITY_SCORE_CONCURRENCY", "4"))
+
+# Days per itinerary segment written in parallel by the plan stage (0 disables splitting)
+PLAN_SEGMENT_DAYS = int(os.getenv("PLAN_SEGMENT_DAYS", "3"))
+
+# Maximum number of itinerary segments written concurrently
+PLAN_SEGMENT_CONCURRENCY = int(os.getenv("PLAN_SEGMENT_CONCURRENCY", "4"))
+
+SCORE_PATTERN = re.compile(r"\bScore\b\W*?(\d+(?:\.\d+)?)", re.IGNORECASE)
+SELECTED_CITY_PATTERN = re.compile(r"Selected City\W*?:\**\s*(.+)", re.IGNORECASE)
+# First line of the ranking merge_city_scores() appends to a multi-city identify report
+RANKING_WINNER_PATTERN = re.compile(r"\*\*Candidate Ranking\*\*:\s*\n1\. (.+): (?:no score|[\d.]+)\s*$", re.MULTILINE)
+
+# Request fields each checkpointed stage depends on; a stage is reused when
+# they are unchanged. Identify carries a forecast for the exact dates, while
+# gather only depends on the chosen city, the month and the interests, so a
+# trip shifted by a few days keeps its local research and a change of
+# interests keeps its city selection.
+STAGE_INPUTS = {
+    "identify": ("origin", "cities", "date_range"),
+    "gather": ("cities", "month", "interests")
+}
+
+# Headings used when a stage report is handed to a later stage
+STAGE_TITLES = {
+    "identify": "City Selection Report",
+    "destination": "Destination Knowledge Report",
+    "gather": "Local Insight Report",
+    "plan": "Travel Itinerary"
+}
+
+
+def format_context(outputs):
+    """
+    Formats earlier stage reports as context for the next stage.
+
+    Args:
+        outputs (dict): Stage name -> report text.
+
+    Returns:
+        str: The reports under their headings, in pipeline order.
+    """
+    sections = [
+        f"### {STAGE_TITLES[stage]}\n{outputs[stage]}"
+        for stage in STAGES if outputs.get(stage)
+    ]
+    return "\n\n".join(sections)
+
+
+def partial_plan(outputs, days=None):
+    """
+    Formats what a run finished before its token budget ran out.
+
+    Args:
+        outputs (dict): Stage name -> report text of the finished stages.
+        days (str): Itinerary days that were already written, if any.
+
+    Returns:
+        str: A note followed by the finished reports.
+    """
+    sections = [
+        "## Partial Plan\n\n"
+        "_The token budget for this trip ran out before the itinerary was finished. "
+        "These are the reports completed so far._",
+        format_context(outputs)
+    ]
+    if days:
+        sections.append(f"### {STAGE_TITLES['plan']} (incomplete)\n{days}")
+    return "\n\n".join(section for section in sections if section)
+
+
+def split_candidate_cities(cities):
+    """
+    Splits a destination field into its candidate cities.
+
+    Args:
+        cities (str): Destination, e.g. "Lisbon; Porto" or "Kyoto or Osaka".
+
+    Returns:
+        list: Distinct candidate cities in input order (a single city gives a one-item list).
+    """
+    candidates = []
+    for part in CANDIDATE_SEPARATOR.split(str(cities)):
+        part = part.strip(" .")
+        if part and part.lower() not in (c.lower() for c in candidates):
+            candidates.append(part)
+    return candidates
+
+
+def parse_score(report):
+    """
+    Returns the score of a city evaluation report, or None if it has none.
+    """
+    match = SCORE_PATTERN.search(report or "")
+    return float(match.group(1)) if match else None
+
+
+def selected_city(report, default):
+    """
+    Returns the city named on the "Selected City" line of an identify report,
+    or `default` when the report does not name one.
+    """
+    match = SELECTED_CITY_PATTERN.search(report or "")
+    if not match:
+        return default
+    city = match.group(1).strip(" *`")
+    return city or default
+
+
+def trip_destination(cities, report):
+    """
+    Returns the city the later stages plan for and their checkpoints and
+    shared destination knowledge are keyed on.
+
+    Not taken from the free-text "Selected City" line, which varies between
+    runs: a single-city request keeps the requested destination, and a
+    multi-city request uses the winner merge_city_scores() ranked first.
+
+    Args:
+        cities (str): The requested destination or candidate cities.
+        report (str): The identify report.
+
+    Returns:
+        str: The destination city.
+    """
+    candidates = split_candidate_cities(cities)
+    if len(candidates) < 2:
+        return cities
+    match = RANKING_WINNER_PATTERN.search(report or "")
+    if match and match.group(1).strip() in candidates:
+        return match.group(1).strip()
+    # Reports without a ranking: the named city if it is a candidate, else the first candidate
+    named = normalize_field(selected_city(report, ""))
+    return next((city for city in candidates if normalize_field(city) == named), candidates[0])
+
+
+def stage_dependencies(stage, origin, cities, interests, date_range):
+    """
+    Returns the request fields the output of `stage` depends on.
+
+    Args:
+        stage (str): A key of STAGE_INPUTS.
+        origin, cities, interests, date_range: The stage's inputs.
+
+    Returns:
+        dict: Field name -> value.
+    """
+    values = {
+        "origin": origin,
+        "cities": cities,
+        "interests": interests,
+        "date_range": date_range,
+        "month": travel_month(date_range)
+    }
+    dependencies = {name: values[name] for name in STAGE_INPUTS[stage]}
+    # With several candidates the traveler's interests decide which city wins
+    if stage == "identify" and len(split_candidate_cities(cities)) > 1:
+        dependencies["interests"] = interests
+    return dependencies
+
+
+def split_days(date_range, segment_days):
+    """
+    Splits a "YYYY-MM-DD to YYYY-MM-DD" range into consecutive day segments.
+
+    Args:
+        date_range (str): Travel date range (both days included).
+        segment_days (int): Days per segment.
+
+    Returns:
+        list: Segment dicts with first_day, last_day (1-based day numbers),
+            start and end dates; empty if the range cannot be parsed.
+    """
+    try:
+        start, end = (datetime.strptime(part.strip(), "%Y-%m-%d").date() for part in date_range.split(" to "))
+    except ValueError:
+        return []
+    total_days = (end - start).days + 1
+    if total_days < 1 or segment_days < 1:
+        return []
+    segments = []
+    for first in range(1, total_days + 1, segment_days):
+        last = min(first + segment_days - 1, total_days)
+        segments.append({
+            "first_day": first,
+            "last_day": last,
+            "start": (start + timedelta(days=first - 1)).isoformat(),
+            "end": (start + timedelta(days=last - 1)).isoformat()
+        })
+    return segments
+
+
+def merge_city_scores(scorecards):
+    """
+    Picks the best candidate from per-city evaluation reports.
+
+    Cheap and deterministic: highest score wins, ties and unscored reports go
+    to the earlier candidate. The winner's report becomes the identify-stage
+    report, followed by a short ranking of the other candidates.
+
+    Args:
+        scorecards (list): (city, report) pairs in candidate order.
+
+    Returns:
+        tuple: (winning city, merged report).
+    """
+    scores = [parse_score(report) for _, report in scorecards]
+    # Highest score first; unscored reports rank last; ties keep candidate order
+    order = sorted(range(len(scorecards)), key=lambda i: (scores[i] is None, -(scores[i] or 0), i))
+    winner, report = scorecards[order[0]]
+    ranking = "\n".join(
+        f"{position}. {scorecards[i][0]}: {'no score' if scores[i] is None else f'{scores[i]:g}'}"
+        for position, i in enumerate(order, start=1)
+    )
+    return winner, f"{report.strip()}\n\n**Candidate Ranking**:\n{ranking}"
+
+
+class TripPlanner():
+    """
+    Runs the identify -> gather -> plan pipeline one stage at a time.
+
+    Each stage is a single-task crew that receives the reports of the earlier
+    stages as context (the same hand-off a sequential crew does internally),
+    which lets callers share, reuse or resume individual stages.
+    """
+    def __init__(self, agents=None, tasks=None, checkpoints=None, knowledge=None):
+        """
+        Args:
+            agents (TripAgents): Agent factory; defaults to the process-wide one.
+            tasks (TripTasks): Task factory.
+            checkpoints (StageCheckpoints): Store for finished stage outputs; defaults to the process-wide one.
+            knowledge (DestinationKnowledge): Shared destination research; defaults to the process-wide one.
+        """
+        self.agents = agents or get_trip_agents()
+        self.tasks = tasks or TripTasks()
+        self.checkpoints = checkpoints or stage_checkpoints
+        self.knowledge = knowledge or destination_knowledge
+
+    def run_stage(self, stage, origin, cities, interests, date_range, context=None, tags=None):
+        """
+        Runs a single pipeline stage as its own crew.
+
+        Args:
+            stage (str): One of STAGES, or "score" to evaluate a single candidate city.
+            origin (str): The traveler's origin city.
+            cities (str): Destination city or candidate cities.
+            interests (str): Traveler's interests.
+            date_range (str): Travel date range.
+            context (str): Reports of earlier stages, if any.
+            tags (dict): Extra fields added to the stage's progress events.
+
+        Returns:
+            str: The stage report.
+        """
+        tags = tags or {}
+        if stage == "score":
+            agent = self.agents.city_selection_agent()
+            task = self.tasks.city_score_task(agent, origin, cities, interests, date_range)
+        elif stage == "identify":
+            agent = self.agents.city_selection_agent()
+            task = self.tasks.identity_task(agent, origin, cities, interests, date_range, context=context)
+        elif stage == "gather":
+            agent = self.agents.local_expert()
+            task = self.tasks.gather_task(agent, origin, cities, interests, date_range, context=context)
+        elif stage == "plan":
+            agent = self.agents.travel_concierge()
+            task = self.tasks.plan_task(agent, origin, cities, interests, date_range, context=context)
+        else:
+            raise ValueError(f"Unknown stage: {stage}")
+
+        return self._kickoff(stage, agent, task, tags)
+
+    def _kickoff(self, stage, agent, task, tags):
+        # Runs one task as its own crew, wrapped in task_started / task_finished events
+        logger.info("Running stage '%s'", stage)
+        with tagged(stage=stage):
+            emit("task_started", **tags)
+            start = time.perf_counter()
+            crew = Crew(agents=[agent], tasks=[task], verbose=True)
+            output = crew.kickoff().raw
+            emit("task_finished", duration=round(time.perf_counter() - start, 3), output=output, **tags)
+        return output
+
+    def identify(self, origin, cities, interests, date_range, tags=None):
+        """
+        Runs the identify stage.
+
+        A destination listing several cities is scored city by city in
+        parallel (one single-city evaluation each) and the best one is picked
+        by merge_city_scores(); a single city runs the regular identify task.
+        Candidates whose evaluation fails are left out of the comparison.
+
+        Returns:
+            str: The City Selection Report.
+        """
+        candidates = split_candidate_cities(cities)
+        if len(candidates) < 2:
+            return self.run_stage("identify", origin, cities, interests, date_range, tags=tags)
+
+        tags = tags or {}
+        logger.info("Scoring %s candidate cities in parallel: %s", len(candidates), candidates)
+        emit("task_started", stage="identify", candidates=candidates, **tags)
+        start = time.perf_counter()
+        workers = max(1, min(CITY_SCORE_CONCURRENCY, len(candidates)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="city-score") as executor:
+            futures = [
+                (city, submit_with_context(
+                    executor, self.run_stage, "score", origin, city, interests, date_range,
+                    tags={**tags, "candidate": city}
+                ))
+                for city in candidates
+            ]
+            scorecards = []
+            for city, future in futures:
+                try:
+                    scorecards.append((city, future.result()))
+                except Exception as e:
+                    logger.error("Scoring failed for candidate %s: %s", city, e)
+        if not scorecards:
+            raise RuntimeError(f"Could not evaluate any of the candidate cities: {', '.join(candidates)}")
+
+        winner, output = merge_city_scores(scorecards)
+        logger.info("Selected %s out of %s candidates", winner, len(candidates))
+        emit("task_finished", stage="identify", duration=round(time.perf_counter() - start, 3), output=output, selected=winner, **tags)
+        return output
+
+    def gather(self, origin, cities, interests, date_range, context=None, tags=None):
+        """
+        Runs the gather stage on top of the shared destination knowledge.
+
+        The traveler-independent research for (city, travel month) comes from
+        the destination knowledge store, or is researched once and stored.
+        The Local Expert then only personalizes it for this traveler. If the
+        research fails, the regular gather task runs on its own.
+
+        Returns:
+            str: The Local Insight Report.
+        """
+        month = travel_month(date_range)
+
+        def research():
+            agent = self.agents.local_expert()
+            task = self.tasks.destination_task(agent, cities, month)
+            return self._kickoff("destination", agent, task, tags or {})
+
+        try:
+            knowledge = self.knowledge.get_or_run(cities, month, research)
+        except Exception as e:
+            logger.error("Destination research failed for %s, gathering without it: %s", cities, e)
+            knowledge = None
+        if knowledge:
+            section = f"### {STAGE_TITLES['destination']}\n{knowledge}"
+            context = f"{context}\n\n{section}" if context else section
+        return self.run_stage("gather", origin, cities, interests, date_range, context=context, tags=tags)
+
+    def plan(self, origin, cities, interests, date_range, context=None, tags=None):
+        """
+        Runs the plan stage.
+
+        Trips longer than PLAN_SEGMENT_DAYS have their days written in
+        parallel segments from the same earlier-stage context, stitched in
+        order, and completed by one summary task that writes the budget,
+        packing and tips sections from the finished days (so the budget
+        matches the activities). Shorter trips, or date ranges that cannot be
+        parsed, run the regular plan task. A failed segment is retried once on
+        its own and stitched in with the others; only if the retry fails too
+        does the stage fall back to the regular plan task.
+
+        Returns:
+            str: The Travel Itinerary.
+        """
+        segments = split_days(date_range, PLAN_SEGMENT_DAYS)
+        if len(segments) < 2:
+            return self.run_stage("plan", origin, cities, interests, date_range, context=context, tags=tags)
+
+        tags = tags or {}
+        total_days = segments[-1]["last_day"]
+        logger.info("Writing a %s-day itinerary in %s parallel segments", total_days, len(segments))
+        emit("task_started", stage="plan", segments=len(segments), **tags)
+        start = time.perf_counter()
+        workers = max(1, min(PLAN_SEGMENT_CONCURRENCY, len(segments)))
+        written, failed = {}, {}
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="plan-days") as executor:
+            def write(indices):
+                futures = {
+                    index: submit_with_context(
+                        executor, self._plan_days, origin, cities, interests, date_range, segments[index], total_days,
+                        context, {**tags, "days": f"{segments[index]['first_day']}-{segments[index]['last_day']}"}
+                    )
+                    for index in indices
+                }
+                for index, future in futures.items():
+                    try:
+                        written[index] = future.result().strip()
+                        failed.pop(index, None)
+                    except Exception as e:
+                        failed[index] = e
+
+            write(range(len(segments)))
+            if failed and not budget_exceeded():
+                logger.error("Retrying %s failed itinerary segment(s): %s", len(failed), next(iter(failed.values())))
+                write(list(failed))
+
+        days = None
+        if failed:
+            error = next(iter(failed.values()))
+            if budget_exceeded():
+                # No budget left for a one-pass plan; keep the days that were written
+                raise BudgetExceeded(str(error), partial="\n\n".join(written[i] for i in sorted(written))) from error
+            logger.error("Itinerary segment failed twice, writing the plan in one pass: %s", error)
+        else:
+            days = "\n\n".join(written[index] for index in range(len(segments)))
+        if days is None:
+            output = self.run_stage("plan", origin, cities, interests, date_range, context=context, tags=tags)
+        else:
+            agent = self.agents.travel_concierge()
+            task = self.tasks.plan_summary_task(agent, origin, cities, interests, date_range, days, context=context)
+            try:
+                summary = self._kickoff("plan_summary", agent, task, tags)
+            except Exception as e:
+                if budget_exceeded():
+                    raise BudgetExceeded(str(e), partial=days) from e
+                raise
+            output = f"## Day-wise Itinerary\n\n{days}\n\n{summary.strip()}"
+        emit("task_finished", stage="plan", duration=round(time.perf_counter() - start, 3), output=output, **tags)
+        return output
+
+    def _plan_days(self, origin, cities, interests, date_range, segment, total_days, context, tags):
+        agent = self.agents.travel_concierge()
+        task = self.tasks.plan_days_task(agent, origin, cities, interests, date_range, segment, total_days, context=context)
+        return self._kickoff("plan_days", agent, task, tags)
+
+    def run(self, origin, cities, interests, date_range):
+        """
+        Plans a trip end to end.
+
+        The identify and gather reports are checkpointed under fingerprints of
+        only the inputs they depend on (STAGE_INPUTS) plus the report they
+        build on. Rerunning a request whose plan stage failed resumes at the
+        plan stage, and a request that changes e.g. only the interests or
+        shifts the dates reruns just the affected stages. The final itinerary
+        goes to the itinerary cache.
+
+        If the run's hard token budget (see trip_budget.py) runs out, the
+        reports finished so far are returned as a partial plan.
+
+        Returns:
+            str: The final itinerary, or a partial plan.
+
+        Raises:
+            BudgetExceeded: If the budget ran out before any stage finished.
+        """
+        outputs = {}
+        try:
+            return self._run(origin, cities, interests, date_range, outputs)
+        except Exception as e:
+            if not budget_exceeded():
+                raise
+            if not outputs:
+                raise BudgetExceeded(f"{e}; no stage finished within the budget") from e
+            logger.warning("Token budget exhausted after %s, returning a partial plan", ", ".join(outputs))
+            budget = current_budget()
+            budget.partial = True
+            emit("partial_plan", stages=list(outputs), **budget.usage())
+            return partial_plan(outputs, getattr(e, "partial", None))
+
+    def _run(self, origin, cities, interests, date_range, outputs):
+        identify_key = stage_fingerprint("identify", stage_dependencies("identify", origin, cities, interests, date_range))
+        outputs["identify"] = self.checkpoints.run(
+            identify_key, "identify", lambda: self.identify(origin, cities, interests, date_range)
+        )
+        # Later stages work on the chosen city rather than the candidate list
+        destination = trip_destination(cities, outputs["identify"])
+        gather_key = stage_fingerprint("gather", stage_dependencies("gather", origin, destination, interests, date_range))
+        outputs["gather"] = self.checkpoints.run(gather_key, "gather", lambda: self.gather(
+            origin, destination, interests, date_range, context=format_context(outputs)
+        ))
+        return self.plan(origin, destination, interests, date_range, context=format_context(outputs))
+
+    def plan_batch(self, trips, workers=4):
+        """
+        Plans several trips together, sharing the gather stage between trips
+        that go to the same destination in the same month.
+
+        Each trip gets its own identify and plan stages (they depend on the
+        traveler). Trips are then grouped by the city their identify stage
+        selected and their travel month; each group runs the gather stage once,
+        for the union of the group's interests over the group's full date span,
+        and every trip is planned for its selected city.
+        Already cached itineraries are returned without running any stage.
+
+        Every trip has its own token budget (see trip_budget.py); a shared
+        gather stage is charged to its group and split evenly between the
+        group's trips. A trip whose hard budget runs out gets the reports it
+        finished as a PARTIAL plan, like TripPlanner.run().
+
+        Args:
+            trips (list): Dicts with origin, cities, interests and date_range.
+            workers (int): Maximum number of stages running concurrently.
+
+        Returns:
+            list: One result dict per trip, in input order, with status,
+                itinerary, error, group, shared_gather, cached and usage.
+        """
+        results = [None] * len(trips)
+        budgets = [TokenBudget() for _ in trips]
+        pending = []
+        for idx, trip in enumerate(trips):
+            fingerprint = trip_fingerprint(trip["origin"], trip["cities"], trip["date_range"], trip["interests"])
+            cached = trip_result_cache.cache.get(fingerprint)
+            if cached is not None:
+                results[idx] = self._result("SUCCESS", itinerary=cached, cached=True, usage=budgets[idx].usage())
+                continue
+            pending.append(idx)
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-stage") as executor:
+            # Stage 1: identify, per trip
+            identify = self._run_all(executor, {
+                idx: ("identify", trips[idx], None, budgets[idx]) for idx in pending
+            })
+
+            # Trips are grouped by the city their identify stage selected, so candidate
+            # lists that settle on the same city share research and different picks do not
+            destinations, groups = {}, {}
+            for idx in pending:
+                if idx in identify["ok"]:
+                    destinations[idx] = trip_destination(trips[idx]["cities"], identify["ok"][idx])
+                    groups.setdefault(self.group_key(destinations[idx], trips[idx]["date_range"]), []).append(idx)
+            logger.info("Batch of %s trips: %s cached, %s destination groups", len(trips), len(trips) - len(pending), len(groups))
+
+            # Stage 2: gather, once per destination/month group
+            gather_jobs, group_budgets = {}, {}
+            for key, indices in groups.items():
+                group_trip = self._group_trip([trips[idx] for idx in indices])
+                group_trip["cities"] = destinations[indices[0]]
+                group_budgets[key] = TokenBudget()
+                gather_jobs[key] = ("gather", group_trip, format_context({"identify": identify["ok"][indices[0]]}), group_budgets[key])
+            gather = self._run_all(executor, gather_jobs)
+            for key, indices in groups.items():
+                for idx in indices:
+                    budgets[idx].absorb(group_budgets[key], 1 / len(indices))
+
+            # Stage 3: plan, per trip, for its selected city on top of the shared gather report
+            plan_jobs = {}
+            for key, indices in groups.items():
+                if key in gather["ok"]:
+                    for idx in indices:
+                        plan_jobs[idx] = ("plan", {**trips[idx], "cities": destinations[idx]}, format_context({
+                            "identify": identify["ok"][idx],
+                            "gather": gather["ok"][key]
+                        }), budgets[idx])
+            plan = self._run_all(executor, plan_jobs)
+
+        for idx in pending:
+            trip = trips[idx]
+            budget = budgets[idx]
+            key = self.group_key(destinations[idx], trip["date_range"]) if idx in destinations else None
+            shared = key is not None and len(groups[key]) > 1
+            if idx in plan["ok"]:
+                itinerary = plan["ok"][idx]
+                # Degraded plans are not served to later identical requests
+                if not budget.degraded:
+                    trip_result_cache.cache.set(
+                        trip_fingerprint(trip["origin"], trip["cities"], trip["date_range"], trip["interests"]),
+                        itinerary
+                    )
+                results[idx] = self._result("SUCCESS", itinerary=itinerary, group=key, shared_gather=shared,
+                                            usage=budget.usage())
+                continue
+
+            error = identify["error"].get(idx) or gather["error"].get(key) or plan["error"].get(idx)
+            finished = {"identify": identify["ok"].get(idx), "gather": gather["ok"].get(key)}
+            finished = {stage: output for stage, output in finished.items() if output}
+            group_budget = group_budgets.get(key)
+            if finished and (budget.exceeded or (group_budget is not None and group_budget.exceeded)):
+                logger.warning("Token budget exhausted for batch trip %s, returning a partial plan", idx)
+                budget.partial = True
+                itinerary = partial_plan(finished, plan["partial"].get(idx))
+                results[idx] = self._result("PARTIAL", itinerary=itinerary, error=error, group=key,
+                                            shared_gather=shared, usage=budget.usage())
+            else:
+                results[idx] = self._result("error", error=error, group=key, shared_gather=shared,
+                                            usage=budget.usage())
+        return results
+
+    @staticmethod
+    def group_key(destination, date_range):
+        """
+        Trips to the same selected city in the same month share gather-stage work.
+        """
+        return f"{normalize_field(destination)}|{travel_month(date_range)}"
+
+    @staticmethod
+    def _group_trip(trips):
+        # Inputs of a shared gather stage: union of interests over the group's full date span
+        interests = []
+        for trip in trips:
+            if trip["interests"] not in interests:
+                interests.append(trip["interests"])
+        starts, ends = zip(*(trip["date_range"].split(" to ") for trip in trips))
+        return {
+            "origin": trips[0]["origin"],
+            "cities": trips[0]["cities"],
+            "interests": "; ".join(interests),
+            "date_range": f"{min(starts)} to {max(ends)}"
+        }
+
+    def _run_all(self, executor, jobs):
+        # Runs independent stages concurrently, each charged to its own budget; returns
+        # {"ok": {key: output}, "error": {key: message}, "partial": {key: output finished before the budget ran out}}
+        futures = {}
+        for key, (stage, trip, context, budget) in jobs.items():
+            tags = {"item": str(key)}
+            # The worker runs in a copy of this context, so it charges `budget`
+            with metered(budget):
+                if stage == "identify":
+                    futures[key] = submit_with_context(
+                        executor, self.identify, trip["origin"], trip["cities"], trip["interests"],
+                        trip["date_range"], tags=tags
+                    )
+                else:
+                    run = self.gather if stage == "gather" else self.plan
+                    futures[key] = submit_with_context(
+                        executor, run, trip["origin"], trip["cities"], trip["interests"],
+                        trip["date_range"], context=context, tags=tags
+                    )
+        outcome = {"ok": {}, "error": {}, "partial": {}}
+        for key, future in futures.items():
+            try:
+                outcome["ok"][key] = future.result()
+            except Exception as e:
+                logger.error("Batch stage failed for %s: %s", key, e)
+                outcome["error"][key] = str(e)
+                if getattr(e, "partial", None):
+                    outcome["partial"][key] = e.partial
+        return outcome
+
+    @staticmethod
+    def _result(status, itinerary=None, error=None, group=None, shared_gather=False, cached=False, usage=None):
+        return {
+            "status": status,
+            "itinerary": itinerary,
+            "error": error,
+            "group": group,
+            "shared_gather": shared_gather,
+            "cached": cached,
+            "usage": usage
+        }
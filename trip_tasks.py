@@ -1,6 +1,5 @@
 from crewai import Task
 from datetime import date
-import streamlit as st
 import logging
 from dotenv import load_dotenv
 
@@ -35,7 +34,22 @@ class TripTasks():
         logger.info("Input validation successful")
         return True
 
-    def identity_task(self, agent, origin, cities, interests, date_range):
+    def __with_context(self, description, context):
+        """
+        Appends the reports of earlier planning stages to a task description.
+
+        Args:
+            description (str): The task description.
+            context (str): Output of earlier stages, or None.
+
+        Returns:
+            str: The description, with the context section if any.
+        """
+        if not context:
+            return description
+        return f"{description}\nReports from earlier planning stages (use them as your starting point):\n{context}\n"
+
+    def identity_task(self, agent, origin, cities, interests, date_range, context=None):
         """
         Creates a task for selecting the best destination city based on traveler preferences.
 
@@ -45,6 +59,7 @@ class TripTasks():
             cities (list): List of candidate destination cities.
             interests (list): List of traveler's interests.
             date_range (str): Travel date range or constraints.
+            context (str): Optional reports of earlier stages, when stages run as separate crews.
 
         Returns:
             Task: Configured CrewAI Task object.
@@ -53,7 +68,7 @@ class TripTasks():
         self.__validate_inputs(origin, cities, interests, date_range)
         logger.info("identity_task: Inputs validated, creating Task object")
         return Task(
-            description=f'''
+            description=self.__with_context(f'''
 You are a travel expert tasked with selecting the **single best destination city** for a traveler based on their preferences and trip details.
 
 Consider the following:
@@ -68,7 +83,7 @@ Your objective is to:
 3. Recommend **one ideal city** that offers the best possible experience within the traveler's constraints.
 
 Justify your selection with a short, thoughtful explanation. This recommendation will be used for creating a personalized itinerary.
-''',
+''', context),
             expected_output=''' 
 A detailed travel recommendation report in the following format:
 
@@ -86,7 +101,57 @@ Present your output in well-formatted Markdown or clean bullet points for readab
             agent=agent
         )
 
-    def gather_task(self, agent, origin, cities, interests, date_range):
+    def city_score_task(self, agent, origin, city, interests, date_range):
+        """
+        Creates a task that evaluates a single candidate city, so several
+        candidates can be scored in parallel and compared afterwards.
+
+        Args:
+            agent: The CrewAI agent assigned to this task.
+            origin (str): The traveler's origin city.
+            city (str): The one candidate city to evaluate.
+            interests (list): List of traveler's interests.
+            date_range (str): Travel date range or constraints.
+
+        Returns:
+            Task: Configured CrewAI Task object.
+        """
+        logger.info("Creating city_score_task for city=%s", city)
+        self.__validate_inputs(origin, city, interests, date_range)
+        return Task(
+            description=f'''
+You are a travel expert evaluating **one candidate destination** for a traveler. Other candidates are being evaluated separately, so focus only on this city.
+
+Consider the following:
+- **Origin**: {origin}
+- **Candidate City**: {city}
+- **Traveler Interests**: {interests}
+- **Trip Date**: {date_range} (including budget, duration, season, or travel dates)
+
+Your objective is to:
+1. Check the weather and seasonal suitability of {city} for the travel dates.
+2. Estimate the cost of getting there from {origin} and staying for the trip.
+3. Judge how well {city} fits the traveler's interests.
+4. Give the city an overall score from 0 to 100 (100 = perfect fit).
+''',
+            expected_output=f'''
+A city evaluation report in the following format:
+
+- **Selected City**: {city}
+- **Score**: <0-100, a single number>
+- **Reason for Selection**: A concise explanation of how well this city fits the traveler's origin, interests, and trip constraints.
+- **Weather Forecast**: 3 to 5-day forecast for the travel dates, or general weather conditions during that season.
+- **Flight or Travel Ticket Info**: Estimated average round-trip flight or travel cost and duration from the origin city.
+- **Accommodation Estimate**: Average cost of staying in the city per night or for the total duration of the trip.
+- **Top Experiences**: 3 to 5 recommended attractions or activities that align with the traveler's interests.
+- **Local Insights**: Tips or updates relevant to tourists (e.g., safety, local customs, travel advisories).
+
+Keep the **Score** line exactly in this format so reports can be compared.
+''',
+            agent=agent
+        )
+
+    def gather_task(self, agent, origin, cities, interests, date_range, context=None):
         """
         Creates a task for gathering local insights and tips for the selected city.
 
@@ -96,6 +161,7 @@ Present your output in well-formatted Markdown or clean bullet points for readab
             cities (list): List of candidate destination cities.
             interests (list): List of traveler's interests.
             date_range (str): Travel date range or constraints.
+            context (str): Optional reports of earlier stages, when stages run as separate crews.
 
         Returns:
             Task: Configured CrewAI Task object.
@@ -104,7 +170,7 @@ Present your output in well-formatted Markdown or clean bullet points for readab
         self.__validate_inputs(origin, cities, interests, date_range)
         logger.info("gather_task: Inputs validated, creating Task object")
         return Task(
-            description=f'''
+            description=self.__with_context(f'''
 You are a knowledgeable local guide for the selected destination city. Based on the traveler's origin, interests, and travel range, your job is to provide a well-rounded, insider-level overview of the chosen city.
 
 Inputs:
@@ -122,7 +188,8 @@ Focus on:
 5. Any safety considerations or local alerts.
 
 Use your expertise to make this feel like it's coming from someone who knows the city deeply and personally.
-''',
+If a Destination Knowledge Report is provided, build on it: tailor it to this traveler's interests and only research what it does not cover.
+''', context),
             expected_output=''' 
 A local insight report for the selected city, structured as follows:
 
@@ -137,7 +204,50 @@ Structure your output in Markdown or clear bullet points. Your tone should be he
             agent=agent
         )
 
-    def plan_task(self, agent, origin, cities, interests, date_range):
+    def destination_task(self, agent, city, month):
+        """
+        Creates a task for researching a destination independently of any
+        traveler, so the report can be shared by everyone visiting the city
+        in the same month.
+
+        Args:
+            agent: The CrewAI agent assigned to this task.
+            city (str): The destination city.
+            month (str): Travel month as "YYYY-MM".
+
+        Returns:
+            Task: Configured CrewAI Task object.
+        """
+        logger.info("Creating destination_task for city=%s, month=%s", city, month)
+        if not city or not month:
+            logger.error("Validation failed: Missing input parameters")
+            raise ValueError("All input parameters must be provided")
+        return Task(
+            description=f'''
+You are a knowledgeable local guide researching **{city}** for visitors arriving in **{month}**. This report is shared by many travelers with different interests, so cover the city broadly rather than for one kind of traveler.
+
+Focus on:
+1. The main neighborhoods and what kind of visitor each one suits.
+2. Local tips, cultural etiquette, and dos & don'ts.
+3. Popular and hidden spots for food, entertainment, and relaxation.
+4. Local events or festivals taking place in {month}.
+5. Any safety considerations, seasonal weather concerns or local alerts.
+''',
+            expected_output='''
+A destination knowledge report, structured as follows:
+
+- **Neighborhoods**: The main neighborhoods and the kind of visitor each suits (e.g., artsy, historic, food-centric, nightlife, family).
+- **Local Tips & Etiquette**: Cultural notes, local customs, and behavior expectations.
+- **Food & Experience Guide**: Popular eateries, hidden gems, street food zones, markets, and local experiences.
+- **Events & Happenings**: Events, festivals, or seasonal activities during the month.
+- **Safety & Practical Notes**: Safety tips, scams to avoid, weather concerns and local transportation hacks.
+
+Structure your output in Markdown or clear bullet points.
+''',
+            agent=agent
+        )
+
+    def plan_task(self, agent, origin, cities, interests, date_range, context=None):
         """
         Creates a task for designing a detailed, personalized travel itinerary.
 
@@ -147,6 +257,7 @@ Structure your output in Markdown or clear bullet points. Your tone should be he
             cities (list): List of candidate destination cities.
             interests (list): List of traveler's interests.
             date_range (str): Travel date range or constraints.
+            context (str): Optional reports of earlier stages, when stages run as separate crews.
 
         Returns:
             Task: Configured CrewAI Task object.
@@ -155,7 +266,7 @@ Structure your output in Markdown or clear bullet points. Your tone should be he
         self.__validate_inputs(origin, cities, interests, date_range)
         logger.info("plan_task: Inputs validated, creating Task object")
         return Task(
-            description=f'''
+            description=self.__with_context(f'''
 You are a world-class travel concierge trusted with designing a seamless and personalized travel plan for a traveler.
 
 Inputs:
@@ -170,7 +281,7 @@ Your task is to:
 3. Include local hacks, smart travel tips, and cost-saving suggestions where possible.
 
 Tailor the plan based on the traveler's preferences — whether they seek cultural immersion, nightlife, adventure, nature, or a mix.
-''',
+''', context),
             expected_output=''' 
 A complete travel itinerary report for the selected city, including:
 
@@ -186,6 +297,110 @@ A complete travel itinerary report for the selected city, including:
 - **Safety or Access Considerations** (if applicable): Tips for accessibility, solo travelers, or families.
 
 Format your output in clearly organized sections, using Markdown-style headings or bullet points. The plan should feel curated and practical, like something you’d hand over to a VIP traveler.
+''',
+            agent=agent
+        )
+
+    def plan_days_task(self, agent, origin, cities, interests, date_range, segment, total_days, context=None):
+        """
+        Creates a task for writing the itinerary of a few consecutive days, so
+        the days of a long trip can be written in parallel.
+
+        Args:
+            agent: The CrewAI agent assigned to this task.
+            origin (str): The traveler's origin city.
+            cities (list): List of candidate destination cities.
+            interests (list): List of traveler's interests.
+            date_range (str): Travel date range of the whole trip.
+            segment (dict): The days to write: first_day, last_day, start and end dates.
+            total_days (int): Length of the whole trip in days.
+            context (str): Optional reports of earlier stages.
+
+        Returns:
+            Task: Configured CrewAI Task object.
+        """
+        logger.info("Creating plan_days_task for days %s-%s", segment["first_day"], segment["last_day"])
+        self.__validate_inputs(origin, cities, interests, date_range)
+        return Task(
+            description=self.__with_context(f'''
+You are a world-class travel concierge writing **part** of a {total_days}-day itinerary. Other parts of the trip are being written at the same time, so cover only your days.
+
+Inputs:
+- **Origin**: {origin}
+- **Destination**: {cities}
+- **Traveler Interests**: {interests}
+- **Whole Trip**: {date_range}
+- **Your Days**: Day {segment["first_day"]} ({segment["start"]}) to Day {segment["last_day"]} ({segment["end"]})
+
+Your task is to:
+1. Use the final selected destination city (from previous reports) as the base.
+2. Plan each of your days with a balance of interest-based activities, relaxation, exploration, and logistics.
+3. Day 1 includes arrival from the origin and the last day of the trip includes departure; plan them only if they fall in your days.
+4. Give an estimated cost for each day's activities and meals.
+
+Do not write an introduction, budget summary, packing list or general tips; those are written separately.
+''', context),
+            expected_output=f'''
+Only the day-wise itinerary for Day {segment["first_day"]} to Day {segment["last_day"]}, one section per day:
+
+### Day <n> - <date>: <theme of the day>
+- **Morning**: ...
+- **Afternoon**: ...
+- **Evening**: ...
+- **Estimated Cost**: <meals + activities for the day>
+
+Use Markdown, starting directly with the first day heading.
+''',
+            agent=agent
+        )
+
+    def plan_summary_task(self, agent, origin, cities, interests, date_range, days, context=None):
+        """
+        Creates a task for the trip-wide sections of an itinerary whose days
+        were written separately, so the budget matches the planned activities.
+
+        Args:
+            agent: The CrewAI agent assigned to this task.
+            origin (str): The traveler's origin city.
+            cities (list): List of candidate destination cities.
+            interests (list): List of traveler's interests.
+            date_range (str): Travel date range or constraints.
+            days (str): The stitched day-wise itinerary.
+            context (str): Optional reports of earlier stages.
+
+        Returns:
+            Task: Configured CrewAI Task object.
+        """
+        logger.info("Creating plan_summary_task for agent=%s", agent)
+        self.__validate_inputs(origin, cities, interests, date_range)
+        return Task(
+            description=self.__with_context(f'''
+You are a world-class travel concierge finishing a travel plan whose day-wise itinerary is already written.
+
+Inputs:
+- **Origin**: {origin}
+- **Destination**: {cities}
+- **Traveler Interests**: {interests}
+- **Trip Range**: {date_range}
+
+Day-wise itinerary:
+{days}
+
+Your task is to write the trip-wide sections of the plan. The budget must add up the daily estimated costs above, plus transport from the origin and accommodation for the whole trip. Do not repeat or rewrite the days.
+''', context),
+            expected_output='''
+The remaining sections of the travel plan, in Markdown:
+
+## Estimated Budget Breakdown
+    - Flights/Transport
+    - Accommodation
+    - Daily Meals
+    - Activities/Entry Tickets
+    - Miscellaneous
+    - Total
+## Packing Suggestions
+## Local Hacks & Pro Tips
+## Safety or Access Considerations (if applicable)
 ''',
             agent=agent
         )
@@ -0,0 +1,175 @@
+import contextvars
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from trip_events import add_listener
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Recorder of the traced run executing in the current context
+_current_trace = contextvars.ContextVar("trip_trace", default=None)
+
+# Longest string kept in a trace event's args (task outputs can be whole reports)
+ARG_LIMIT = 500
+
+# Fields that are part of the trace event itself rather than its args
+_EVENT_FIELDS = {"type", "run_id", "timestamp", "duration"}
+
+_install_lock = threading.Lock()
+_installed = False
+
+
+class TraceRecorder():
+    """
+    Records the events of one planning run together with the thread that
+    emitted them, and exports them as a Chrome trace-event timeline
+    (open it in chrome://tracing or https://ui.perfetto.dev).
+
+    Every task, tool call, page summary chunk, HTTP attempt and LLM call
+    becomes a bar on the lane of the thread that ran it, so serial calls that
+    could overlap are easy to spot. Other events (cache hits, resumed stages,
+    agent steps) are drawn as instant markers.
+    """
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def record(self, event):
+        thread = threading.current_thread()
+        with self._lock:
+            self.events.append((event, thread.ident, thread.name))
+
+    def to_chrome(self):
+        """
+        Returns the recorded run in Chrome trace-event format.
+
+        Returns:
+            dict: {"traceEvents": [...], "displayTimeUnit": "ms"}
+        """
+        with self._lock:
+            recorded = list(self.events)
+        if not recorded:
+            return {"traceEvents": [], "displayTimeUnit": "ms"}
+
+        origin = min(event["timestamp"] - (event.get("duration") or 0) for event, _, _ in recorded)
+        end = max(event["timestamp"] for event, _, _ in recorded)
+        micros = lambda seconds: round((seconds - origin) * 1e6)
+
+        lanes = {}
+        trace_events = []
+        open_spans = {}
+        for event, ident, thread_name in recorded:
+            # Thread ids are reused once a pool's thread exits, so the name is part of the lane
+            lane = (ident, thread_name)
+            if lane not in lanes:
+                lanes[lane] = len(lanes) + 1
+                trace_events.append({"ph": "M", "name": "thread_name", "pid": 1, "tid": lanes[lane], "args": {"name": thread_name}})
+            tid = lanes[lane]
+            kind = event["type"]
+
+            if kind.endswith("_started"):
+                # Spans are drawn from their finished event; keep the start in case it never finishes
+                open_spans.setdefault((lane, kind[:-len("_started")]), []).append(event)
+                continue
+            if kind.endswith("_finished"):
+                span_kind = kind[:-len("_finished")]
+                stack = open_spans.get((lane, span_kind))
+                if stack:
+                    stack.pop()
+                trace_events.append(self._complete(span_kind, event, tid, micros))
+            elif "duration" in event:
+                trace_events.append(self._complete(kind, event, tid, micros))
+            else:
+                trace_events.append({
+                    "ph": "i", "s": "t", "name": kind, "cat": kind, "pid": 1, "tid": tid,
+                    "ts": micros(event["timestamp"]), "args": _args(event)
+                })
+
+        # Spans that never finished (e.g. a crew that raised) run to the end of the trace
+        for (lane, span_kind), stack in open_spans.items():
+            for event in stack:
+                trace_events.append(self._complete(
+                    span_kind, {**event, "timestamp": end, "duration": end - event["timestamp"], "status": "unfinished"},
+                    lanes[lane], micros
+                ))
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    @staticmethod
+    def _complete(kind, event, tid, micros):
+        # A complete ("X") event ending at the event's timestamp
+        duration = event.get("duration") or 0
+        return {
+            "ph": "X", "name": _span_name(kind, event), "cat": kind, "pid": 1, "tid": tid,
+            "ts": micros(event["timestamp"] - duration), "dur": round(duration * 1e6), "args": _args(event)
+        }
+
+    def write(self, path):
+        """
+        Writes the Chrome trace JSON to `path`.
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome(), f, default=str)
+        logger.info("Trace with %s events written to %s", len(self.events), path)
+
+
+def _span_name(kind, event):
+    if kind == "task":
+        name = event.get("stage", "task")
+        detail = event.get("candidate") or event.get("days")
+        return f"{name} {detail}" if detail else name
+    if kind == "tool":
+        return event.get("tool", "tool")
+    if kind == "llm_call":
+        return f"llm {event.get('model', '')}".strip()
+    if kind == "http_request":
+        return f"{event.get('method', '')} {event.get('host', '')}".strip()
+    if kind == "summary":
+        return f"summarize {event.get('mode', '')} chunk {event.get('chunk', '')}"
+    return kind
+
+
+def _args(event):
+    args = {}
+    for key, value in event.items():
+        if key in _EVENT_FIELDS:
+            continue
+        if not isinstance(value, (int, float, bool)) and value is not None:
+            value = str(value)
+            if len(value) > ARG_LIMIT:
+                value = value[:ARG_LIMIT] + "..."
+        args[key] = value
+    return args
+
+
+def _record(event):
+    recorder = _current_trace.get()
+    if recorder is not None:
+        recorder.record(event)
+
+
+@contextmanager
+def recording(recorder=None):
+    """
+    Records every event emitted in the current context (and the tools, LLM
+    calls and worker threads it starts) into a TraceRecorder.
+
+    Args:
+        recorder (TraceRecorder): Recorder to fill; a new one is created if omitted.
+
+    Yields:
+        TraceRecorder: The recorder.
+    """
+    global _installed
+    with _install_lock:
+        if not _installed:
+            _installed = True
+            add_listener(_record)
+    recorder = recorder or TraceRecorder()
+    token = _current_trace.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current_trace.reset(token)